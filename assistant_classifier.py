@@ -0,0 +1,206 @@
+# assistant_classifier.py
+import hashlib
+import json
+from threading import Lock
+
+import numpy as np
+
+from assistant_model_persistence import load_model, save_model
+from cpu_offload import run_cpu_bound
+
+# Probabilité minimale pour accepter la prédiction du modèle (sinon : réponse par défaut)
+MIN_CONFIDENCE = 0.45
+# N-grammes de caractères utilisés à l'entraînement comme à la prédiction
+NGRAM_RANGE = (2, 4)
+
+_MODEL = None
+_MODEL_DISABLED = False
+# Un seul chargement / entraînement à la fois (les autres requêtes attendent son résultat)
+_MODEL_LOCK = Lock()
+
+
+def training_hash(variations):
+    """Empreinte des données d'entraînement : le modèle n'est ré-entraîné que si elle change."""
+    payload = json.dumps(variations, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def char_wb_ngrams(text, ngram_range=NGRAM_RANGE):
+    """N-grammes de caractères par mot, bordés d'espaces (même découpage que l'analyseur 'char_wb' de scikit-learn)."""
+    min_n, max_n = ngram_range
+    ngrams = []
+    for word in text.lower().split():
+        word = f" {word} "
+        for n in range(min_n, max_n + 1):
+            offset = 0
+            ngrams.append(word[offset:offset + n])
+            while offset + n < len(word):
+                offset += 1
+                ngrams.append(word[offset:offset + n])
+            # Un mot plus court que n n'est compté qu'une fois
+            if offset == 0:
+                break
+    return ngrams
+
+
+class IntentModel:
+    """
+    Classifieur TF-IDF + régression logistique, évalué avec numpy seul.
+    Les poids sont des tableaux (éventuellement np.memmap partagés entre workers) :
+    scikit-learn n'est nécessaire que pour l'entraînement.
+    """
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.classes = meta["classes"]
+        self.ngram_range = tuple(meta["ngram_range"])
+        self.vocabulary = {term: index for index, term in enumerate(meta["terms"])}
+        self.idf = arrays["idf"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Extrait vocabulaire et poids d'un pipeline scikit-learn entraîné."""
+        vectorizer = pipeline.named_steps["tfidf"]
+        clf = pipeline.named_steps["clf"]
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, index in vectorizer.vocabulary_.items():
+            terms[index] = term
+        arrays = {
+            "idf": vectorizer.idf_.astype(np.float64),
+            "coef": clf.coef_.astype(np.float64),
+            "intercept": clf.intercept_.astype(np.float64),
+        }
+        meta = {
+            "classes": [str(c) for c in clf.classes_],
+            "terms": terms,
+            "ngram_range": list(vectorizer.ngram_range),
+        }
+        return cls(arrays, meta)
+
+    def vectorize(self, cleaned_question):
+        """Vecteur TF-IDF creux (indices, valeurs) normalisé L2, tf sous-linéaire."""
+        counts = {}
+        for ngram in char_wb_ngrams(cleaned_question, self.ngram_range):
+            index = self.vocabulary.get(ngram)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        if not counts:
+            return None, None
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        values *= self.idf[indices]
+        values /= np.linalg.norm(values)
+        return indices, values
+
+    def predict_proba(self, cleaned_question):
+        """Probabilités par intention (softmax des scores linéaires)."""
+        indices, values = self.vectorize(cleaned_question)
+        scores = np.array(self.intercept, dtype=np.float64)
+        if indices is not None:
+            scores = scores + self.coef[:, indices] @ values
+        scores -= scores.max()
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum()
+
+    def predict_proba_batch(self, cleaned_questions):
+        """
+        Probabilités pour plusieurs questions en un seul produit matriciel.
+        Seules les colonnes du vocabulaire réellement présentes dans le lot sont matérialisées.
+        """
+        rows = [self.vectorize(question) for question in cleaned_questions]
+        used = [indices for indices, _ in rows if indices is not None]
+        scores = np.tile(np.asarray(self.intercept, dtype=np.float64), (len(rows), 1))
+
+        if used:
+            columns = np.unique(np.concatenate(used))
+            matrix = np.zeros((len(rows), len(columns)), dtype=np.float64)
+            for row, (indices, values) in enumerate(rows):
+                if indices is not None:
+                    matrix[row, np.searchsorted(columns, indices)] = values
+            scores += matrix @ self.coef[:, columns].T
+
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def build_training_set(variations, normalize):
+    """Une ligne d'entraînement par variation (mot-clé ou synonyme), normalisée comme les questions."""
+    texts, labels = [], []
+    for intent, intent_variations in variations.items():
+        for mot_cle in intent_variations:
+            text = normalize(mot_cle)
+            if text:
+                texts.append(text)
+                labels.append(intent)
+    return texts, labels
+
+
+def train_pipeline(variations, normalize):
+    """TF-IDF sur n-grammes de caractères + régression logistique (robuste aux fautes de frappe)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    texts, labels = build_training_set(variations, normalize)
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=NGRAM_RANGE, sublinear_tf=True)),
+        ("clf", LogisticRegression(C=10, max_iter=1000)),
+    ])
+    pipeline.fit(texts, labels)
+    return pipeline
+
+
+def train_model(variations, normalize):
+    """Entraîne le pipeline puis l'enregistre au format partagé ; retourne le IntentModel."""
+    model = IntentModel.from_pipeline(train_pipeline(variations, normalize))
+    save_model(model.arrays, model.meta, training_hash(variations))
+    return model
+
+
+def get_model(variations, normalize):
+    """
+    Retourne le modèle : chargé depuis le disque s'il correspond aux données actuelles,
+    sinon ré-entraîné puis sauvegardé. Retourne None si le modèle est indisponible
+    (pas de fichier à jour et scikit-learn non installé).
+    """
+    global _MODEL, _MODEL_DISABLED
+    if _MODEL is not None or _MODEL_DISABLED:
+        return _MODEL
+
+    with _MODEL_LOCK:
+        if _MODEL is not None or _MODEL_DISABLED:
+            return _MODEL
+
+        loaded = load_model(training_hash(variations))
+        if loaded is not None:
+            _MODEL = IntentModel(*loaded)
+            return _MODEL
+
+        try:
+            # Entraînement de secours (modèle absent du déploiement) : hors de la boucle gevent
+            _MODEL = run_cpu_bound(train_model, variations, normalize)
+        except ImportError:
+            print("AVERTISSEMENT : scikit-learn n'est pas installé. Classifieur de l'assistant désactivé.")
+            _MODEL_DISABLED = True
+        return _MODEL
+
+
+def predict_intent(model, cleaned_question):
+    """Retourne (intention, probabilité) pour une question déjà normalisée."""
+    probabilities = model.predict_proba(cleaned_question)
+    best = int(probabilities.argmax())
+    return model.classes[best], float(probabilities[best])
+
+
+def predict_intents(model, cleaned_questions):
+    """Version par lot de predict_intent : liste de (intention, probabilité)."""
+    probabilities = model.predict_proba_batch(cleaned_questions)
+    best = probabilities.argmax(axis=1)
+    return [
+        (model.classes[int(index)], float(probabilities[row, index]))
+        for row, index in enumerate(best)
+    ]
@@ -1,14 +1,28 @@
-import nltk
-from nltk.corpus import wordnet
+import hashlib
+import json
+import os
 import random
 import re
+from functools import lru_cache
 
-# IMPORTANT : Assurez-vous que les packages NLTK nécessaires sont téléchargés.
-# Si vous rencontrez des erreurs de type "LookupError", exécutez ces lignes
-# (une seule fois) dans votre environnement Python :
+from assistant_cache import IntentCache
+from assistant_classifier import MIN_CONFIDENCE, get_model, predict_intent, predict_intents
+from assistant_matcher import IntentMatcher
+
+# IMPORTANT : NLTK n'est plus importé par le serveur web.
+# Les synonymes WordNet sont générés hors ligne par `python build_assistant.py`
+# qui écrit ASSISTANT_VARIATIONS_FILE ; le serveur se contente de lire ce fichier.
+# Pour la génération, les packages NLTK doivent être téléchargés (une seule fois) :
 # nltk.download('wordnet')
 # nltk.download('omw-1.4') # Open Multilingual Wordnet (pour le français)
 
+# Fichier des variations pré-calculées (format versionné)
+ASSISTANT_VARIATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assistant_variations.json")
+VARIATIONS_FORMAT_VERSION = 1
+
+# Taille du cache des questions fréquentes ("bonjour", "livraison", "prix"...)
+ASSISTANT_CACHE_SIZE = int(os.environ.get("ASSISTANT_CACHE_SIZE", "1024"))
+
 # Modèle d'intentions (Simulation)
 INTENTS = {
     # --- INTENTIONS D'IDENTITÉ ---
@@ -133,40 +147,136 @@ INTENTS = {
 
 def generate_variations(mots_cles):
     """
-    Génère des variations de mots-clés simples avec des synonymes en utilisant NLTK.
-    Gère les erreurs si NLTK n'est pas installé ou les ressources manquantes.
+    Génère des variations de mots-clés simples avec des synonymes WordNet (NLTK).
+    Réservé à l'étape de build hors ligne : lève ImportError si NLTK n'est pas installé et
+    LookupError si les ressources 'wordnet' / 'omw-1.4' ne sont pas téléchargées, pour ne jamais
+    produire en silence un fichier de variations sans synonymes.
     """
+    # Import local : seul l'outil de génération hors ligne a besoin de NLTK
+    from nltk.corpus import wordnet
+
     variations = set(mots_cles)
-    
-    # Tentative d'utilisation de WordNet pour les synonymes
-    try:
-        for mot in mots_cles:
-            # Nettoyage et normalisation du mot (suppression des caractères non alpha)
-            clean_mot = re.sub(r'[^a-zA-Záàâäéèêëíìîïóòôöúùûüýÿñç\s]', '', mot, flags=re.I).lower().strip()
-            
-            if len(clean_mot) > 2:
-                 # Ajout du mot sans ponctuation
-                 variations.add(clean_mot)
-            
-            # Recherche de synonymes WordNet
-            for syn in wordnet.synsets(clean_mot, lang='fra'):
-                for lemma in syn.lemmas(lang='fra'):
-                    synonyme = lemma.name().replace('_', ' ').lower().strip()
-                    if synonyme and synonyme != clean_mot:
-                        variations.add(synonyme)
-
-    except LookupError:
-        # L'utilisateur n'a pas téléchargé les données NLTK (omw-1.4 ou wordnet)
-        print("AVERTISSEMENT NLTK : Les ressources NLTK ne sont pas téléchargées. La détection sera moins performante (pas de synonymes).")
-        pass 
-    except Exception as e:
-        # Autres erreurs NLTK
-        print(f"ERREUR NLTK : Problème lors de la génération des synonymes : {e}")
-        pass
+    for mot in mots_cles:
+        # Nettoyage et normalisation du mot (suppression des caractères non alpha)
+        clean_mot = re.sub(r'[^a-zA-Záàâäéèêëíìîïóòôöúùûüýÿñç\s]', '', mot, flags=re.I).lower().strip()
+        
+        if len(clean_mot) > 2:
+             # Ajout du mot sans ponctuation
+             variations.add(clean_mot)
+        
+        # Recherche de synonymes WordNet
+        for syn in wordnet.synsets(clean_mot, lang='fra'):
+            for lemma in syn.lemmas(lang='fra'):
+                synonyme = lemma.name().replace('_', ' ').lower().strip()
+                if synonyme and synonyme != clean_mot:
+                    variations.add(synonyme)
         
     return list(variations)
 
 
+# --- VARIATIONS PRÉ-CALCULÉES (étape de build hors ligne) ---
+
+def intents_hash(intents=None):
+    """Empreinte des mots-clés de INTENTS : change dès qu'un mot-clé est modifié."""
+    intents = INTENTS if intents is None else intents
+    mots_cles = {intent: data["mots_cles"] for intent, data in intents.items()}
+    payload = json.dumps(mots_cles, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def expand_intents(intents=None):
+    """Calcule les variations (synonymes WordNet compris) de chaque intention."""
+    intents = INTENTS if intents is None else intents
+    return {
+        intent: sorted(generate_variations(data["mots_cles"]))
+        for intent, data in intents.items()
+        if intent != "port_secrete"
+    }
+
+
+def keyword_variations(intents=None):
+    """Mots-clés bruts de chaque intention, sans synonymes (repli du serveur, n'importe pas NLTK)."""
+    intents = INTENTS if intents is None else intents
+    return {
+        intent: sorted(set(data["mots_cles"]))
+        for intent, data in intents.items()
+        if intent != "port_secrete"
+    }
+
+
+def save_variations(variations, path=ASSISTANT_VARIATIONS_FILE, intents=None):
+    """Écrit le fichier de variations (écriture dans un fichier temporaire puis renommage)."""
+    artifact = {
+        "version": VARIATIONS_FORMAT_VERSION,
+        "intents_hash": intents_hash(intents),
+        "variations": variations,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    print(f"Variations sauvegardées dans : {path}")
+
+
+def load_variations(path=ASSISTANT_VARIATIONS_FILE, intents=None):
+    """
+    Charge les variations pré-calculées.
+    Retourne None si le fichier est absent, d'une autre version ou périmé
+    (mots-clés de INTENTS modifiés depuis la génération).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+    except Exception as e:
+        print(f"AVERTISSEMENT : Fichier de variations illisible ({path}) : {e}")
+        return None
+
+    if artifact.get("version") != VARIATIONS_FORMAT_VERSION:
+        print(f"AVERTISSEMENT : Version du fichier de variations non supportée ({artifact.get('version')}).")
+        return None
+    if artifact.get("intents_hash") != intents_hash(intents):
+        print("AVERTISSEMENT : Fichier de variations périmé, relancez `python build_assistant.py`.")
+        return None
+    return artifact.get("variations")
+
+
+# --- INDEX D'INTENTIONS (construit une seule fois) ---
+# Les variations (synonymes WordNet compris) ne changent pas entre deux
+# requêtes : on les calcule au premier appel puis on les réutilise.
+_INTENT_INDEX = None
+
+
+def build_intent_index(intents=None):
+    """
+    Construit l'index des intentions à partir de INTENTS.
+
+    Retourne un dictionnaire avec :
+    - "variations" : intention -> liste des variations (mots-clés + synonymes)
+    - "matcher" : automate Aho-Corasick compilé sur toutes les variations
+    """
+    intents = INTENTS if intents is None else intents
+
+    # Variations générées hors ligne ; à défaut, mots-clés seuls (NLTK n'est jamais importé ici)
+    variations = load_variations(intents=intents)
+    if variations is None:
+        variations = keyword_variations(intents)
+
+    return {
+        "variations": variations,
+        "matcher": IntentMatcher(variations),
+    }
+
+
+def get_intent_index():
+    """Retourne l'index des intentions, en le construisant au premier appel."""
+    global _INTENT_INDEX
+    if _INTENT_INDEX is None:
+        _INTENT_INDEX = build_intent_index()
+    return _INTENT_INDEX
+
+
 def normalize_question(question):
     """Nettoyage et normalisation du texte pour un matching plus précis."""
     
@@ -186,58 +296,70 @@ def normalize_question(question):
     return cleaned_question
 
 
-def get_assistant_response(question):
-    """
-    Détecte l'intention avec robustesse et renvoie une réponse aléatoire variée.
-    """
-    # Normalisation de la question une seule fois
-    cleaned_question = normalize_question(question)
+# Version mémorisée pour les requêtes : une question déjà vue n'est pas re-nettoyée
+normalize_question_cached = lru_cache(maxsize=ASSISTANT_CACHE_SIZE)(normalize_question)
+
+# Question normalisée -> tuple des meilleures intentions (vide si réponse par défaut)
+_INTENT_CACHE = IntentCache(ASSISTANT_CACHE_SIZE)
+
+
+def get_cache_stats():
+    """Compteurs de succès/échecs des caches de l'assistant."""
+    normalize_info = normalize_question_cached.cache_info()
+    return {
+        "intents": _INTENT_CACHE.stats(),
+        "normalize": {
+            "hits": normalize_info.hits,
+            "misses": normalize_info.misses,
+            "size": normalize_info.currsize,
+            "maxsize": normalize_info.maxsize,
+        },
+    }
 
-    # 1. Vérification de la Porte Secrète (Check strict)
-    # On utilise une vérification simple et normalisée du mot-clé
-    if "je suis cherif ton createur ouvre moi la porte 001" in cleaned_question:
-        return {"intent": "port_secrete", "response": ""}
 
-    # 2. Détection d'intention
-    best_intent = "defaut"
+def clear_caches():
+    """Vide les caches (à appeler si INTENTS ou le modèle changent en cours d'exécution)."""
+    _INTENT_CACHE.clear()
+    normalize_question_cached.cache_clear()
+
+
+SECRET_DOOR_PHRASE = "je suis cherif ton createur ouvre moi la porte 001"
+
+
+def detect_keyword_intents(cleaned_question, intent_index):
+    """
+    Retourne les intentions ayant le plus de variations présentes dans la question
+    (liste vide si aucun mot-clé ne correspond).
+    """
     max_matches = 0
     
     # Liste pour stocker les intentions avec le plus de correspondances
     top_intents = [] 
 
-    # On utilise un ensemble (set) pour garantir que le même mot-clé dans la question
-    # ne compte pas deux fois (même s'il apparaît dans plusieurs variations)
-    matched_words = set() 
-    
-    # Itération sur toutes les intentions pour trouver le meilleur match
-    for intent, data in INTENTS.items():
-        if intent == "port_secrete":
-            continue
+    # Un seul passage sur la question pour toutes les variations de toutes les intentions
+    match_counts = intent_index["matcher"].count_matches(cleaned_question)
 
-        current_matches = 0
-        
-        # Utilisation des variations (y compris synonymes)
-        for mot_cle in generate_variations(data["mots_cles"]):
-            # On vérifie si le mot-clé (ou sa variation) est dans la question normalisée
-            if mot_cle in cleaned_question:
-                current_matches += 1
-                # On ajoute le mot-clé d'origine à l'ensemble pour une potentielle détection d'ambiguïté future
-                matched_words.add(mot_cle) 
+    # Parcours dans l'ordre de INTENTS pour conserver le même départage qu'avant
+    for intent in intent_index["variations"]:
+        current_matches = match_counts[intent]
         
         # Mise à jour du meilleur match trouvé
         if current_matches > max_matches:
             max_matches = current_matches
-            best_intent = intent
             # Si nous trouvons un nouveau meilleur, on réinitialise la liste des tops
             top_intents = [intent] 
         elif current_matches == max_matches and current_matches > 0:
             # Gestion de l'égalité : ajout à la liste pour les départager plus tard si nécessaire
             top_intents.append(intent) 
-    
-    # 3. Génération de la Réponse
+
+    return top_intents
+
+
+def build_response(top_intents):
+    """Génère la réponse (aléatoire parmi les meilleures intentions, sinon contact WhatsApp)."""
     
     # Seulement un match si on a trouvé au moins 1 mot-clé
-    if max_matches > 0:
+    if top_intents:
         # S'il y a égalité, on choisit aléatoirement parmi les meilleures
         final_intent = random.choice(top_intents) 
         return {"intent": final_intent, "response": random.choice(INTENTS[final_intent]["reponses"])}
@@ -262,4 +384,80 @@ def get_assistant_response(question):
             "intent": "defaut", 
             "response": default_message,
             "contact_wa": contact_numbers
-}
+        }
+
+
+def get_assistant_response(question):
+    """
+    Détecte l'intention avec robustesse et renvoie une réponse aléatoire variée.
+    """
+    # Normalisation de la question une seule fois
+    cleaned_question = normalize_question_cached(question)
+
+    # 1. Vérification de la Porte Secrète (Check strict)
+    # On utilise une vérification simple et normalisée du mot-clé
+    if SECRET_DOOR_PHRASE in cleaned_question:
+        return {"intent": "port_secrete", "response": ""}
+
+    # 2. Détection d'intention (résultat mis en cache, pas la réponse tirée au sort)
+    top_intents = _INTENT_CACHE.get(cleaned_question)
+    if top_intents is None:
+        # Index pré-calculé : plus aucun appel WordNet pendant la requête
+        intent_index = get_intent_index()
+        top_intents = detect_keyword_intents(cleaned_question, intent_index)
+        
+        # Aucun mot-clé exact : le classifieur TF-IDF rattrape les fautes de frappe ("bonjuor", "livrason")
+        if not top_intents and cleaned_question:
+            model = get_model(intent_index["variations"], normalize_question)
+            if model is not None:
+                predicted_intent, confidence = predict_intent(model, cleaned_question)
+                if confidence >= MIN_CONFIDENCE:
+                    top_intents = [predicted_intent]
+
+        top_intents = tuple(top_intents)
+        _INTENT_CACHE.put(cleaned_question, top_intents)
+
+    # 3. Génération de la Réponse
+    return build_response(top_intents)
+
+
+def get_assistant_responses(questions):
+    """
+    Version par lot de get_assistant_response : une réponse par question, dans le même ordre.
+    Les questions sans mot-clé exact sont évaluées ensemble par le classifieur (un seul produit matriciel).
+    """
+    intent_index = get_intent_index()
+    cleaned_questions = [normalize_question_cached(question) for question in questions]
+
+    resolved = [None] * len(questions)
+    unmatched = []
+
+    for position, cleaned_question in enumerate(cleaned_questions):
+        if SECRET_DOOR_PHRASE in cleaned_question:
+            continue
+        top_intents = _INTENT_CACHE.get(cleaned_question)
+        if top_intents is None:
+            top_intents = tuple(detect_keyword_intents(cleaned_question, intent_index))
+            if not top_intents and cleaned_question:
+                unmatched.append(position)
+                continue
+            _INTENT_CACHE.put(cleaned_question, top_intents)
+        resolved[position] = top_intents
+
+    if unmatched:
+        model = get_model(intent_index["variations"], normalize_question)
+        predictions = [(None, 0.0)] * len(unmatched)
+        if model is not None:
+            predictions = predict_intents(model, [cleaned_questions[position] for position in unmatched])
+        for position, (predicted_intent, confidence) in zip(unmatched, predictions):
+            top_intents = (predicted_intent,) if confidence >= MIN_CONFIDENCE else ()
+            _INTENT_CACHE.put(cleaned_questions[position], top_intents)
+            resolved[position] = top_intents
+
+    results = []
+    for cleaned_question, top_intents in zip(cleaned_questions, resolved):
+        if SECRET_DOOR_PHRASE in cleaned_question:
+            results.append({"intent": "port_secrete", "response": ""})
+        else:
+            results.append(build_response(top_intents))
+    return results
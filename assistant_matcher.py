@@ -0,0 +1,90 @@
+# assistant_matcher.py
+from collections import deque
+
+
+class IntentMatcher:
+    """
+    Automate Aho-Corasick regroupant toutes les variations de toutes les intentions.
+
+    La question normalisée est parcourue une seule fois, quel que soit le nombre
+    de variations : le coût ne grandit plus avec (intentions × variations).
+    """
+
+    def __init__(self, variations_by_intent):
+        # Ordre des intentions conservé pour garder le même départage qu'avant
+        self.intents = list(variations_by_intent.keys())
+
+        # Chaque motif (variation) est stocké une fois, avec ses intentions
+        self.patterns = []
+        self.pattern_intents = []
+        pattern_ids = {}
+
+        for intent, variations in variations_by_intent.items():
+            for mot_cle in variations:
+                if not mot_cle:
+                    continue
+                if mot_cle not in pattern_ids:
+                    pattern_ids[mot_cle] = len(self.patterns)
+                    self.patterns.append(mot_cle)
+                    self.pattern_intents.append([])
+                intents = self.pattern_intents[pattern_ids[mot_cle]]
+                if intent not in intents:
+                    intents.append(intent)
+
+        self._build(self.patterns)
+
+    def _build(self, patterns):
+        """Construit le trie, les liens d'échec et les sorties de l'automate."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        # 1. Trie des motifs
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(pattern_id)
+
+        # 2. Liens d'échec (parcours en largeur)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Les motifs reconnus par le lien d'échec le sont aussi ici
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find_patterns(self, text):
+        """Retourne l'ensemble des identifiants de motifs présents dans le texte."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._out[state]:
+                found.update(self._out[state])
+        return found
+
+    def count_matches(self, text):
+        """
+        Compte, pour chaque intention, le nombre de variations distinctes
+        présentes dans le texte (même règle que `mot_cle in question`).
+        """
+        counts = {intent: 0 for intent in self.intents}
+        for pattern_id in self.find_patterns(text):
+            for intent in self.pattern_intents[pattern_id]:
+                counts[intent] += 1
+        return counts
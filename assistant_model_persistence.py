@@ -1,30 +1,116 @@
 # assistant_model_persistence.py
-import pickle
+#
+# Format du fichier modèle (lecture seule, partageable entre workers via mmap) :
+#   MAGIC (8 octets) | longueur de l'en-tête (uint32, little-endian) | en-tête JSON | données brutes
+# L'en-tête contient la version du schéma, l'empreinte des données d'entraînement,
+# la somme de contrôle SHA-256 des données brutes, les métadonnées du modèle et,
+# pour chaque tableau numpy, son type, sa forme et son décalage dans le fichier.
+import hashlib
+import json
 import os
+import struct
 
-ASSISTANT_MODEL_FILE = "assistant_data.pkl"
+import numpy as np
 
-def save_model(pipeline):
+ASSISTANT_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assistant_model.bin")
+MODEL_MAGIC = b"BCBPMDL\x00"
+MODEL_SCHEMA_VERSION = 1
+# Alignement des tableaux dans le fichier (compatible avec tous les types numpy)
+ARRAY_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+def save_model(arrays, meta, intents_hash=None):
+    """
+    Écrit le modèle de façon atomique : fichier temporaire puis renommage.
+    Un worker qui lit pendant l'écriture voit soit l'ancien fichier, soit le nouveau, jamais un fichier à moitié écrit.
+    """
+    specs = {}
+    chunks = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = _align(offset)
+        specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        chunks.append((offset, array.tobytes()))
+        offset += array.nbytes
+
+    payload = bytearray(offset)
+    for chunk_offset, chunk in chunks:
+        payload[chunk_offset:chunk_offset + len(chunk)] = chunk
+
+    header = json.dumps({
+        "schema_version": MODEL_SCHEMA_VERSION,
+        "intents_hash": intents_hash,
+        "checksum": hashlib.sha256(payload).hexdigest(),
+        "meta": meta,
+        "arrays": specs,
+    }, ensure_ascii=False).encode("utf-8")
+
+    # Les données brutes commencent sur une frontière alignée
+    data_start = _align(len(MODEL_MAGIC) + 4 + len(header))
+    padding = data_start - (len(MODEL_MAGIC) + 4 + len(header))
+
+    tmp_path = f"{ASSISTANT_MODEL_FILE}.{os.getpid()}.tmp"
     try:
-        with open(ASSISTANT_MODEL_FILE, 'wb') as f:
-            pickle.dump(pipeline, f)
+        with open(tmp_path, 'wb') as f:
+            f.write(MODEL_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\x00" * padding)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, ASSISTANT_MODEL_FILE)
         print(f"Modèle sauvegardé dans : {ASSISTANT_MODEL_FILE}")
     except Exception as e:
         print(f"ERREUR sauvegarde modèle : {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
 
-def load_model():
+def load_model(intents_hash=None):
+    """
+    Charge le modèle en mémoire partagée (np.memmap en lecture seule).
+    Retourne (arrays, meta) ou None si le fichier est absent, d'un autre schéma,
+    périmé ou corrompu. Le fichier n'est jamais supprimé : il sera simplement remplacé.
+    """
     if not os.path.exists(ASSISTANT_MODEL_FILE):
         print(f"Fichier modèle non trouvé → entraînement nécessaire")
         return None
     try:
         with open(ASSISTANT_MODEL_FILE, 'rb') as f:
-            pipeline = pickle.load(f)
+            if f.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+                raise ValueError("signature de fichier invalide")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+
+        if header.get("schema_version") != MODEL_SCHEMA_VERSION:
+            print(f"Version de modèle non supportée ({header.get('schema_version')}) → ré-entraînement nécessaire")
+            return None
+        if intents_hash is not None and header.get("intents_hash") != intents_hash:
+            print("Modèle périmé (INTENTS modifié) → ré-entraînement nécessaire")
+            return None
+
+        data_start = _align(len(MODEL_MAGIC) + 4 + header_length)
+        data = np.memmap(ASSISTANT_MODEL_FILE, dtype=np.uint8, mode='r', offset=data_start)
+        if hashlib.sha256(data).hexdigest() != header["checksum"]:
+            raise ValueError("somme de contrôle invalide")
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype=np.int64))
+            start = spec["offset"]
+            arrays[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
         print(f"Modèle chargé avec succès : {ASSISTANT_MODEL_FILE}")
-        return pipeline
+        return arrays, header["meta"]
     except Exception as e:
-        print(f"Modèle corrompu → suppression et ré-entraînement : {e}")
-        try:
-            os.remove(ASSISTANT_MODEL_FILE)
-        except:
-            pass
-        return None
\ No newline at end of file
+        print(f"Modèle illisible → ré-entraînement nécessaire : {e}")
+        return None
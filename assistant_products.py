@@ -0,0 +1,82 @@
+# assistant_products.py
+#
+# Réponses de l'assistant sur les produits du catalogue : un produit cité dans la question
+# ("prix iphone 13", "le casque JBL est dispo ?") est retrouvé dans l'index en mémoire
+# (voir product_search.py) et l'assistant répond avec son prix et sa disponibilité.
+from product_search import is_name_term, tokenize
+
+# Mots indiquant ce que le client demande (repliés comme les questions : sans accents ni pluriels)
+PRICE_TERMS = set(tokenize("prix coût coûte combien tarif cher montant vaut"))
+STOCK_TERMS = set(tokenize("stock disponible dispo disponibilité reste rupture avez vendez"))
+
+# Nombre maximal de produits cités dans une réponse
+MAX_PRODUCTS_IN_ANSWER = 3
+# En dessous de ce stock, la quantité restante est précisée
+LOW_STOCK_THRESHOLD = 3
+
+
+def match_product_question(question, catalog_index, predicate=None):
+    """
+    Retourne {'products': [...], 'asks_price': bool, 'asks_stock': bool} si la question cite
+    un ou plusieurs produits du catalogue, None sinon.
+    """
+    terms = set(tokenize(question))
+    asks_price = bool(terms & PRICE_TERMS)
+    asks_stock = bool(terms & STOCK_TERMS)
+
+    # Les mots de la demande, les élisions ("c'est") et les lettres isolées ne font pas partie du nom recherché
+    mention_terms = sorted(term for term in terms - PRICE_TERMS - STOCK_TERMS if is_name_term(term))
+    if not mention_terms:
+        return None
+    mention = " ".join(mention_terms)
+    products = catalog_index.match_names(mention, limit=MAX_PRODUCTS_IN_ANSWER, predicate=predicate)
+    if not products:
+        return None
+    return {"products": products, "asks_price": asks_price, "asks_stock": asks_stock}
+
+
+def format_price(prix_gnf):
+    return "{:,.0f}".format(float(prix_gnf or 0)).replace(",", " ") + " GNF"
+
+
+def format_availability(stock):
+    if stock is None:
+        return "disponibilité à confirmer sur WhatsApp"
+    if stock <= 0:
+        return "❌ actuellement en rupture de stock"
+    if stock <= LOW_STOCK_THRESHOLD:
+        return f"✅ en stock (plus que {stock})"
+    return "✅ en stock"
+
+
+def build_product_response(match, product_url):
+    """
+    Réponse de l'assistant (même forme que build_response) pour les produits trouvés.
+    `product_url(produit)` donne le lien de la fiche produit, proposé en bouton.
+    """
+    products = match["products"]
+    # Sans précision, on donne le prix et la disponibilité
+    show_price = match["asks_price"] or not match["asks_stock"]
+    show_stock = match["asks_stock"] or not match["asks_price"]
+
+    lines = []
+    for product in products:
+        details = []
+        if show_price:
+            details.append(format_price(product.get("prix_gnf")))
+        if show_stock:
+            details.append(format_availability(product.get("stock")))
+        lines.append(f"**{product['nom']}** : {', '.join(details)}")
+
+    if len(lines) == 1:
+        response = lines[0] + "."
+    else:
+        response = "Voici les produits correspondants :\n" + "\n".join(f"- {line}" for line in lines)
+
+    return {
+        "intent": "produit",
+        "response": response,
+        "assistant_links": [
+            {"label": f"Voir {product['nom']}", "url": product_url(product)} for product in products
+        ],
+    }
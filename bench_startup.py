@@ -0,0 +1,88 @@
+# bench_startup.py
+# Mesure le coût d'import de main.py (ce que paie chaque worker Gunicorn au démarrage).
+#   python bench_startup.py                 # version actuelle
+#   python bench_startup.py --ref baseline  # compare avec main.py d'une autre révision git
+# Aucun appel réseau : create_client ne fait que construire le client.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Exécuté dans un processus neuf : compte les clients Supabase / applications Flask créés
+PROBE = r"""
+import json, sys, time
+import flask, supabase
+counts = {"create_client": 0, "Flask": 0}
+_create_client = supabase.create_client
+def create_client(*args, **kwargs):
+    counts["create_client"] += 1
+    return _create_client(*args, **kwargs)
+supabase.create_client = create_client
+_flask_init = flask.Flask.__init__
+def flask_init(self, *args, **kwargs):
+    counts["Flask"] += 1
+    _flask_init(self, *args, **kwargs)
+flask.Flask.__init__ = flask_init
+start = time.perf_counter()
+import main
+counts["import_ms"] = (time.perf_counter() - start) * 1000
+counts["routes"] = len(list(main.app.url_map.iter_rules()))
+print(json.dumps(counts))
+"""
+
+
+def run(main_dir, runs):
+    """Lance `runs` imports à froid de main.py depuis main_dir ; retourne les mesures."""
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+    env.setdefault("SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.bench")
+    env.setdefault("FLASK_SECRET_KEY", "bench")
+    # main_dir en premier (répertoire courant du sous-processus) : on peut y placer un main.py d'une autre révision
+    env["PYTHONPATH"] = os.pathsep.join([main_dir, REPO_DIR])
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=main_dir, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        results.append(json.loads(output))
+    return results
+
+
+def report(label, results):
+    times = [r["import_ms"] for r in results]
+    last = results[-1]
+    print(f"{label}: import médian {statistics.median(times):.1f} ms "
+          f"(min {min(times):.1f}, max {max(times):.1f}) | "
+          f"create_client x{last['create_client']} | Flask x{last['Flask']} | {last['routes']} routes")
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ref", help="révision git de main.py à comparer (ex : baseline, HEAD~1)")
+    args = parser.parse_args()
+
+    current = report("actuel", run(REPO_DIR, args.runs))
+
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = subprocess.run(
+                ["git", "show", f"{args.ref}:main.py"], cwd=REPO_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout
+            with open(os.path.join(tmp, "main.py"), "w", encoding="utf-8") as f:
+                f.write(source)
+            reference = report(args.ref, run(tmp, args.runs))
+        print(f"gain : {reference - current:.1f} ms par worker ({(1 - current / reference) * 100:.0f} %)")
+
+
+if __name__ == '__main__':
+    main()
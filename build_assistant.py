@@ -0,0 +1,49 @@
+# build_assistant.py
+# Étape de build hors ligne de l'assistant : à lancer après toute modification de INTENTS.
+#   python build_assistant.py
+# Nécessite NLTK (pip install -r requirements-build.txt) et les ressources 'wordnet' + 'omw-1.4' :
+# sans elles le build échoue (code de sortie non nul) au lieu de produire un fichier sans synonymes.
+# Le fichier assistant_variations.json produit est versionné, le serveur web n'importe jamais NLTK
+# (en son absence, il se replie sur les mots-clés bruts).
+import sys
+
+from assistant_classifier import train_model
+from assistant_data import ASSISTANT_VARIATIONS_FILE, expand_intents, normalize_question, save_variations
+
+# Ressources NLTK indispensables aux synonymes français
+NLTK_RESOURCES = ("corpora/wordnet", "corpora/omw-1.4")
+
+
+def check_nltk_resources():
+    """Arrête le build si NLTK ou ses ressources WordNet ne sont pas installés."""
+    try:
+        import nltk
+    except ImportError:
+        sys.exit("ERREUR NLTK : NLTK n'est pas installé (pip install -r requirements-build.txt).")
+
+    missing = []
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource.split("/")[-1])
+    if missing:
+        sys.exit(
+            f"ERREUR NLTK : Ressources manquantes ({', '.join(missing)}). "
+            f"Téléchargez-les avec : python -m nltk.downloader {' '.join(missing)}"
+        )
+
+
+def main():
+    check_nltk_resources()
+    variations = expand_intents()
+    total = sum(len(v) for v in variations.values())
+    print(f"{total} variations générées pour {len(variations)} intentions.")
+    save_variations(variations, ASSISTANT_VARIATIONS_FILE)
+
+    # Entraînement du classifieur une seule fois ici : les workers ne font que le charger
+    train_model(variations, normalize_question)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# catalog_cache.py
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class TTLCache:
+    """
+    Cache en mémoire (par worker) avec durée de vie, taille bornée et invalidation explicite.
+    Utilisé devant les requêtes Supabase du catalogue : les pages publiques
+    sont rendues depuis la mémoire tant que l'entrée n'a pas expiré.
+    Au-delà de `max_entries`, les entrées expirées puis les moins récemment utilisées sont évincées.
+    """
+
+    def __init__(self, ttl=60, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, loader):
+        """
+        Retourne la valeur en cache si elle est encore valide, sinon appelle loader().
+        Un résultat None (erreur Supabase) n'est pas mis en cache.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    return entry[1]
+                del self._data[key]
+
+        value = loader()
+        if value is not None and self.ttl > 0:
+            with self._lock:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+                self._data.move_to_end(key)
+                if len(self._data) > self.max_entries:
+                    self._evict()
+        return value
+
+    def _evict(self):
+        """Retire les entrées expirées, puis les moins récemment utilisées jusqu'à la taille maximale."""
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Supprime une entrée, ou tout le cache si aucune clé n'est donnée."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
@@ -0,0 +1,174 @@
+# catalog_import.py
+#
+# Import / export en masse du catalogue : lecture en flux des lignes CSV ou JSONL,
+# validation, regroupement en lots pour des upserts groupés, et sérialisation de l'export.
+# Les appels Supabase restent dans main.py.
+import csv
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre de produits envoyés par upsert
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "200"))
+# Nombre de lignes lues par requête lors de l'export
+EXPORT_PAGE_SIZE = 500
+
+# Pool dédié aux images de l'import : chaque upload lance lui-même un fan_out pour ses variantes
+IMPORT_IMAGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("IMPORT_IMAGE_WORKERS", "4")),
+    thread_name_prefix="catalog-import",
+)
+
+# Colonnes de l'export (et colonnes reconnues à l'import, 'image' désignant un fichier du zip)
+EXPORT_FIELDS = ["id", "nom", "description", "prix_gnf", "type", "stock", "image_url"]
+
+
+def detect_format(filename):
+    """'csv' ou 'jsonl' d'après l'extension du fichier, None sinon."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension == "csv":
+        return "csv"
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    return None
+
+
+def detach_upload(file_storage):
+    """
+    Retire le flux d'un fichier envoyé pour qu'il reste ouvert après la fin de la vue :
+    Flask ferme les fichiers de la requête avant que la réponse en flux ne soit générée.
+    L'appelant doit fermer le flux retourné.
+    """
+    stream = file_storage.stream
+    file_storage.stream = io.BytesIO()
+    return stream
+
+
+def iter_rows(stream, file_format):
+    """
+    Génère (numéro_de_ligne, ligne, erreur) sans charger le fichier entier.
+    `ligne` vaut None quand la ligne JSONL n'est pas un objet JSON valide.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_number, line in enumerate(text, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, None, f"JSON invalide : {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, None, "un objet JSON est attendu"
+                    continue
+                yield line_number, row, None
+    finally:
+        # Ne pas fermer le flux de l'upload avec l'enveloppe texte
+        text.detach()
+
+
+def iter_batches(items, size=IMPORT_BATCH_SIZE):
+    """Regroupe un itérable en listes de `size` éléments au plus."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(row, key):
+    value = row.get(key)
+    return str(value).strip() if value is not None else ""
+
+
+def validate_row(row, category_slugs):
+    """
+    Valide une ligne importée. Retourne (produit, nom_image, erreurs).
+    Un identifiant est généré pour les nouveaux produits. Une ligne avec un id met à jour le produit :
+    la description et le stock absents ou vides ne sont pas envoyés (valeurs existantes conservées),
+    un fichier « id,nom,prix_gnf,type » ne change donc que ces colonnes.
+    """
+    errors = []
+
+    product_id = _text(row, "id")
+    is_update = bool(product_id)
+    if product_id:
+        try:
+            product_id = str(uuid.UUID(product_id))
+        except ValueError:
+            errors.append(f"id invalide « {product_id} »")
+    else:
+        product_id = str(uuid.uuid4())
+
+    nom = _text(row, "nom")
+    if not nom:
+        errors.append("nom manquant")
+
+    prix_gnf = None
+    raw_prix = _text(row, "prix_gnf") or _text(row, "prix")
+    try:
+        prix_gnf = float(raw_prix.replace(" ", "").replace(",", "."))
+        if prix_gnf < 0:
+            errors.append("prix négatif")
+    except ValueError:
+        errors.append(f"prix invalide « {raw_prix} »")
+
+    product_type = _text(row, "type")
+    if product_type not in category_slugs:
+        errors.append(f"type inconnu « {product_type} » (attendu : {', '.join(sorted(category_slugs))})")
+
+    stock = None if is_update else 0
+    raw_stock = _text(row, "stock")
+    if raw_stock:
+        try:
+            stock = int(float(raw_stock))
+            if stock < 0:
+                errors.append("stock négatif")
+        except ValueError:
+            errors.append(f"stock invalide « {raw_stock} »")
+
+    if errors:
+        return None, None, errors
+
+    product = {
+        "id": product_id,
+        "nom": nom,
+        "prix_gnf": prix_gnf,
+        "type": product_type,
+    }
+    description = _text(row, "description")
+    if description or not is_update:
+        product["description"] = description
+    if stock is not None:
+        product["stock"] = stock
+    return product, os.path.basename(_text(row, "image")) or None, []
+
+
+def export_header(file_format):
+    """Première ligne de l'export ('' pour JSONL)."""
+    return csv_line(EXPORT_FIELDS) if file_format == "csv" else ""
+
+
+def export_line(product, file_format):
+    """Une ligne d'export pour un produit {champ: valeur} (champs de EXPORT_FIELDS)."""
+    if file_format == "csv":
+        return csv_line([product.get(field, "") for field in EXPORT_FIELDS])
+    return json.dumps({field: product.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False) + "\n"
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if value is None else value for value in values])
+    return buffer.getvalue()
@@ -0,0 +1,23 @@
+# cpu_offload.py
+#
+# Calculs longs (numpy / scikit-learn / Pillow) exécutés hors de la boucle d'événements gevent.
+# Avec les workers gevent (voir gunicorn.conf.py), threading.Thread crée un greenlet : un calcul
+# lancé « en arrière-plan » s'exécuterait sur le hub et figerait toutes les requêtes du worker.
+# On le confie alors à un vrai thread système (pool du hub) ; seul le greenlet appelant attend.
+
+
+def run_cpu_bound(func, *args, **kwargs):
+    """
+    Appelle func(*args, **kwargs) dans un thread système si gevent a patché le module threading,
+    directement sinon (workers gthread ou serveur de développement : on est déjà dans un vrai thread).
+    `func` ne doit pas prendre de verrou partagé avec les greenlets (verrous patchés par gevent).
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return func(*args, **kwargs)
+    if not monkey.is_module_patched("threading"):
+        return func(*args, **kwargs)
+
+    import gevent
+    return gevent.get_hub().threadpool.apply(func, args, kwargs)
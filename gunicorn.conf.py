@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+#
+# Mode de service pour des routes qui attendent presque toujours Supabase :
+# workers "gevent" (coopératifs) par défaut. Chaque appel réseau bloquant rend la main,
+# un worker garde donc des centaines de requêtes Supabase en vol au lieu d'une par thread.
+# Lancement : gunicorn -c gunicorn.conf.py main:app  (voir Procfile)
+import importlib.util
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+# gevent si installé, sinon workers à threads
+_default_worker_class = "gevent" if importlib.util.find_spec("gevent") is not None else "gthread"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", _default_worker_class)
+
+# gevent : nombre maximal de requêtes simultanées par worker
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "500"))
+# gthread : nombre de threads par worker
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Pas de préchargement : chaque worker crée son propre client Supabase et son pool HTTP
+# (et gevent patche les sockets avant l'import de main.py).
+preload_app = False
+
+if worker_class == "gevent":
+    # Le pool HTTP vers Supabase doit suivre la concurrence du worker
+    os.environ.setdefault("SUPABASE_HTTP_MAX_CONNECTIONS", "100")
+    os.environ.setdefault("SUPABASE_HTTP_MAX_KEEPALIVE", "50")
+    os.environ.setdefault("QUERY_FANOUT_WORKERS", "32")
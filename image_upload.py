@@ -0,0 +1,139 @@
+# image_upload.py
+#
+# Réception des images envoyées par l'administration sans les charger en mémoire :
+# le fichier est recopié par blocs dans un fichier temporaire (taille limitée pendant la copie),
+# son type est vérifié par signature (magic bytes), puis il est envoyé au Storage en flux
+# ou, au-delà d'un seuil, par upload résumable (protocole TUS de Supabase Storage).
+import base64
+import os
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import urljoin
+
+import httpx
+
+# Taille des blocs lus depuis le formulaire
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Supabase impose des blocs de 6 Mo pour les uploads résumables
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+RESUMABLE_MAX_RETRIES = 3
+
+# Signatures des formats acceptés : extension, type MIME
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+]
+
+
+class UploadRejected(ValueError):
+    """Fichier refusé (trop volumineux, vide ou pas une image reconnue) ; le message est affiché à l'administrateur."""
+
+
+def detect_image_type(head):
+    """Retourne (extension, type MIME) d'après les premiers octets du fichier, ou None."""
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, content_type
+    # WebP : conteneur RIFF....WEBP
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
+
+@contextmanager
+def spooled_image(file, max_bytes):
+    """
+    Recopie le fichier envoyé par blocs dans un fichier temporaire et fournit
+    {'path', 'size', 'extension', 'content_type'}. Le fichier temporaire est supprimé à la sortie.
+    Lève UploadRejected dès que la limite est dépassée ou si la signature n'est pas celle d'une image.
+    """
+    stream = getattr(file, "stream", file)
+    if hasattr(stream, "seek"):
+        stream.seek(0)
+
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".part", delete=False)
+    try:
+        size = 0
+        head = b""
+        with handle:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"Image trop volumineuse (maximum {max_bytes // (1024 * 1024)} Mo).")
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                handle.write(chunk)
+
+        if size == 0:
+            raise UploadRejected("Le fichier envoyé est vide.")
+        detected = detect_image_type(head)
+        if detected is None:
+            raise UploadRejected("Format non autorisé : seules les images JPEG, PNG, GIF et WebP sont acceptées.")
+
+        extension, content_type = detected
+        yield {"path": handle.name, "size": size, "extension": extension, "content_type": content_type}
+    finally:
+        try:
+            os.remove(handle.name)
+        except OSError:
+            pass
+
+
+def resumable_upload(http_client, supabase_url, auth_headers, bucket, storage_path, spooled,
+                     chunk_size=RESUMABLE_CHUNK_SIZE, max_retries=RESUMABLE_MAX_RETRIES):
+    """
+    Upload résumable (TUS) d'un fichier temporaire vers Supabase Storage.
+    `auth_headers` ({'apikey', 'Authorization'}) doit être celui du client Supabase courant :
+    après connexion, il porte le jeton de l'administrateur, comme les uploads simples.
+    Un seul bloc est en mémoire à la fois ; après une erreur réseau, l'envoi reprend
+    à l'offset confirmé par le serveur au lieu de tout recommencer.
+    """
+    endpoint = f"{supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+    headers = {**auth_headers, "Tus-Resumable": "1.0.0"}
+    metadata = {
+        "bucketName": bucket,
+        "objectName": storage_path,
+        "contentType": spooled["content_type"],
+        "cacheControl": "3600",
+    }
+    encoded_metadata = ",".join(
+        f"{key} {base64.b64encode(value.encode('utf-8')).decode('ascii')}" for key, value in metadata.items()
+    )
+
+    created = http_client.post(endpoint, headers={
+        **headers,
+        "Upload-Length": str(spooled["size"]),
+        "Upload-Metadata": encoded_metadata,
+    })
+    created.raise_for_status()
+    location = urljoin(endpoint, created.headers["Location"])
+
+    offset = 0
+    retries = 0
+    with open(spooled["path"], "rb") as source:
+        while offset < spooled["size"]:
+            source.seek(offset)
+            chunk = source.read(chunk_size)
+            try:
+                response = http_client.patch(location, content=chunk, headers={
+                    **headers,
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream",
+                })
+                response.raise_for_status()
+                offset = int(response.headers["Upload-Offset"])
+                retries = 0
+            except httpx.HTTPError as e:
+                retries += 1
+                if retries > max_retries:
+                    raise
+                print(f"AVERTISSEMENT : Bloc d'upload interrompu à l'offset {offset}, reprise ({retries}/{max_retries}) : {e}")
+                # Le serveur indique le dernier octet réellement reçu
+                status = http_client.head(location, headers=headers)
+                status.raise_for_status()
+                offset = int(status.headers["Upload-Offset"])
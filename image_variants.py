@@ -0,0 +1,99 @@
+# image_variants.py
+#
+# Variantes redimensionnées et recompressées d'une photo produit (JPEG + WebP),
+# générées une fois à l'upload pour que les pages n'envoient plus les originaux.
+import io
+
+# Largeur maximale (px) de chaque variante
+VARIANT_WIDTHS = {
+    "thumb": 320,
+    "card": 640,
+    "detail": 1280,
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+
+def generate_variants(source):
+    """
+    Retourne une liste de variantes {name, format, width, height, content, content_type}
+    à partir du contenu (bytes) ou du chemin du fichier image (lu directement sur disque).
+    Les images ne sont jamais agrandies. Liste vide si Pillow n'est pas installé
+    ou si le fichier n'est pas une image lisible (l'original reste utilisé).
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("AVERTISSEMENT : Pillow n'est pas installé, aucune variante d'image générée.")
+        return []
+
+    largest = max(VARIANT_WIDTHS.values())
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        # JPEG : décodage directement à échelle réduite (1/2, 1/4, 1/8) tant que les deux côtés restent
+        # au moins égaux à la plus grande variante ; une photo de 24 Mpx n'est jamais décodée en entier
+        image.draft("RGB", (largest, largest))
+        # Autres formats : réduction entière juste après le décodage, avant toute conversion
+        factor = min(image.width, image.height) // largest
+        if factor > 1:
+            image = image.reduce(factor)
+        # Respecter l'orientation EXIF des photos de téléphone
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+            # Fond blanc pour la transparence (PNG/GIF) : le JPEG n'a pas de canal alpha
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+    except Exception as e:
+        print(f"AVERTISSEMENT : Image illisible, pas de variantes : {e}")
+        return []
+
+    variants = []
+    seen_widths = set()
+    for name, max_width in sorted(VARIANT_WIDTHS.items(), key=lambda item: item[1]):
+        width = min(max_width, image.width)
+        # Image plus petite que la variante : inutile de produire un doublon plus grand
+        if width in seen_widths:
+            continue
+        seen_widths.add(width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+        jpeg = io.BytesIO()
+        resized.save(jpeg, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        variants.append({"name": name, "format": "jpeg", "width": width, "height": height,
+                         "content": jpeg.getvalue(), "content_type": "image/jpeg"})
+
+        webp = io.BytesIO()
+        resized.save(webp, "WEBP", quality=WEBP_QUALITY, method=4)
+        variants.append({"name": name, "format": "webp", "width": width, "height": height,
+                         "content": webp.getvalue(), "content_type": "image/webp"})
+
+    return variants
+
+
+def build_srcset(variantes, image_format="jpeg"):
+    """Attribut srcset ('url 320w, url 640w, ...') depuis la colonne variantes d'images_produits."""
+    if not variantes:
+        return ""
+    entries = sorted(
+        (v for v in variantes.values() if v.get(image_format)),
+        key=lambda v: v["width"],
+    )
+    return ", ".join(f"{v[image_format]} {v['width']}w" for v in entries)
+
+
+def pick_variant_url(variantes, preferred, image_format="jpeg"):
+    """URL de la variante demandée, à défaut de la plus grande variante plus petite, sinon None."""
+    if not variantes:
+        return None
+    if variantes.get(preferred, {}).get(image_format):
+        return variantes[preferred][image_format]
+    target = VARIANT_WIDTHS.get(preferred, 0)
+    smaller = [v for v in variantes.values() if v.get(image_format) and v["width"] <= target]
+    if smaller:
+        return max(smaller, key=lambda v: v["width"])[image_format]
+    return None
@@ -1,13 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, current_app, Response, stream_with_context
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
 from functools import wraps
+import atexit
+import csv
 import os
 import uuid 
 import io 
+import base64
+import json
+import zipfile
+import time
+from threading import Event, Lock, Thread
 from werkzeug.utils import secure_filename 
 from flask import url_for 
 from datetime import datetime
 
+from catalog_cache import TTLCache
+from query_fanout import fan_out
+from cpu_offload import run_cpu_bound
+from image_variants import generate_variants, build_srcset, pick_variant_url
+from image_upload import UploadRejected, resumable_upload, spooled_image
+import catalog_import
+from product_search import ProductSearchIndex
+from assistant_products import build_product_response, match_product_question
+from related_products import RelatedProducts
+from order_queue import OrderRejected, OrderWriter, build_order
+from supabase_transport import build_http_client, load_transport_config, transport_stats
+
 # ===================================================================
 # --- MODIFICATIONS CRUCIALES POUR LE DÉPLOIEMENT ---
 
@@ -18,26 +38,41 @@ SUPABASE_KEY = os.environ.get("SUPABASE_ANON_KEY")
 # NOTE: Nous utilisons "SUPABASE_ANON_KEY" pour la clarté, 
 # même si le nom était "SUPABASE_KEY" avant.
 
-# Initialisation du client Supabase
-# Si les clés ne sont pas définies (par exemple, en local sans fichier .env), le programme plantera ici.
-# Ce comportement est normal en déploiement.
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Client Supabase UNIQUE du processus, créé par create_app() (voir en bas du fichier).
+supabase: Client = None
 
-# --- Configuration Flask ---
-app = Flask(__name__)
+# --- FIN DES MODIFICATIONS CRUCIALES ---
+# ===================================================================
 
-# 2. Rendre la clé secrète OBLIGATOIREMENT lue de l'environnement
-#    La valeur par défaut est supprimée pour forcer son utilisation en production.
-app.secret_key = os.environ.get("FLASK_SECRET_KEY") 
+# --- ENREGISTREMENT DES ROUTES ---
+# Les routes sont déclarées avec @route(...) puis enregistrées UNE fois par create_app().
+# Les noms d'endpoints restent ceux des fonctions (url_for('index'), url_for('admin_dashboard'), ...).
+_ROUTES = []
+_CONTEXT_PROCESSORS = []
 
-app.config['SUPABASE_URL'] = SUPABASE_URL
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
-# --- FIN DES MODIFICATIONS CRUCIALES ---
-# ===================================================================
+def route(rule, **options):
+    """Équivalent différé de @app.route."""
+    def decorator(view_func):
+        _ROUTES.append((rule, view_func, options))
+        return view_func
+    return decorator
+
+
+def context_processor(f):
+    """Équivalent différé de @context_processor."""
+    _CONTEXT_PROCESSORS.append(f)
+    return f
+
 
 STORAGE_BUCKET = "images_produits"
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Nombre de produits par page (pagination par curseur)
+CATEGORY_PAGE_SIZE = 24
+ADMIN_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 100
+# Nombre de suggestions de saisie (/api/suggest)
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
 
 # ✅ Numéros WhatsApp pour la commande (sans le '+' pour l'API wa.me)
 WHATSAPP_NUMBERS = [
@@ -47,6 +82,38 @@ WHATSAPP_NUMBERS = [
 PRIMARY_WHATSAPP_NUMBER = WHATSAPP_NUMBERS[0] if WHATSAPP_NUMBERS else None
 
 
+# --- PROJECTIONS DE COLONNES PAR VUE ---
+# Chaque page ne lit que les colonnes qu'elle affiche : pas de description ni de produits_json
+# transférés (et décodés) pour une grille qui n'affiche que nom, prix et vignette.
+PROJECTIONS = {
+    # Cartes produit (accueil, API) ; 'created_at' sert au curseur de pagination
+    'card': 'id, nom, prix_gnf, type, created_at, main_image_url, main_image_variantes',
+    # Cartes de la page catégorie (extrait de description affiché)
+    'category_card': 'id, nom, description, prix_gnf, type, created_at, main_image_url, main_image_variantes',
+    # Fiche produit avec toutes ses images
+    'detail': 'id, nom, description, prix_gnf, type, stock, images_produits(id, url, est_principale, variantes)',
+    # Lignes du tableau d'administration des produits
+    'admin_row': 'id, nom, prix_gnf, type, stock, created_at',
+    # Formulaire de modification d'un produit
+    'admin_form': 'id, nom, description, prix_gnf, type, stock, main_image_url',
+    # Résumé des commandes (liste d'administration)
+    'order_summary': 'id, client_name, client_quartier, date_commande, produits_json, statut, total_gnf',
+    # Contenu de la page À Propos
+    'about': 'id, mission_title, mission_text, commitment_title, commitment_list_text, whatsapp_number, email',
+    # Export du catalogue
+    'export': 'id, nom, description, prix_gnf, type, stock, created_at, main_image_url',
+    # Documents de l'index de recherche (affichés tels quels dans les résultats)
+    'search': 'id, nom, description, prix_gnf, type, stock, created_at, main_image_url, main_image_variantes',
+    # Nom et prix faisant foi pour les lignes de commande
+    'order_line': 'id, nom, prix_gnf',
+}
+
+
+def select_view(table, view, **kwargs):
+    """Requête Supabase sur `table` limitée aux colonnes de la vue `view` (voir PROJECTIONS)."""
+    return supabase.table(table).select(PROJECTIONS[view], **kwargs)
+
+
 # --- LOGIQUE DES CATÉGORIES ---
 
 def get_categories_list():
@@ -57,7 +124,7 @@ def get_categories_list():
         {'name': 'Accessoires', 'slug': 'accessoire', 'icon': '🎧'},
     ]
 
-@app.context_processor
+@context_processor
 def inject_globals():
     """Rend les types de produits et le numéro WhatsApp PRINCIPAL disponibles globalement dans les templates Jinja."""
     return dict(
@@ -68,38 +135,111 @@ def inject_globals():
 
 
 # --- Fonctions utilitaires ---
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def upload_image_to_supabase(file, product_id):
-    if file and allowed_file(file.filename):
-        file_extension = file.filename.rsplit('.', 1)[1].lower()
-        # Générer un nom de fichier unique
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        # Chemin de stockage: produits/<ID_produit>/<NOM_UNIQUE>.ext
-        storage_path = f"produits/{product_id}/{unique_filename}" 
-        
-        file.seek(0)
-        file_content = file.read()
-        
+def upload_image_to_supabase(spooled, product_id):
+    """Envoie au Storage une image déjà recopiée sur disque (voir spooled_image) et retourne son URL publique."""
+    # Chemin de stockage: produits/<ID_produit>/<NOM_UNIQUE>.ext (extension déduite du contenu)
+    storage_path = f"produits/{product_id}/{uuid.uuid4()}.{spooled['extension']}"
+
+    if spooled['size'] > current_app.config['STORAGE_RESUMABLE_THRESHOLD']:
+        # Gros fichier : upload résumable par blocs de 6 Mo
+        # En-têtes du client courant : jeton de l'administrateur connecté (remplacé par supabase-py
+        # à la connexion), sinon la clé anonyme — comme pour supabase.storage
+        auth_headers = {
+            "apikey": SUPABASE_KEY,
+            "Authorization": supabase.options.headers.get("Authorization", f"Bearer {SUPABASE_KEY}"),
+        }
+        resumable_upload(current_app.extensions['supabase_http'], SUPABASE_URL, auth_headers,
+                         STORAGE_BUCKET, storage_path, spooled)
+    else:
+        # Envoi en flux depuis le disque : le contenu n'est jamais chargé entièrement en mémoire
+        with open(spooled['path'], 'rb') as source:
+            supabase.storage.from_(STORAGE_BUCKET).upload(storage_path, source, file_options={"content-type": spooled['content_type']})
+    # Récupérer l'URL publique
+    return supabase.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
+
+def upload_product_image(file, product_id):
+    """
+    Upload de l'original puis de ses variantes redimensionnées (JPEG + WebP).
+    Retourne {'url': ..., 'variantes': {...}} pour la ligne images_produits, ou None si l'upload échoue.
+    Lève UploadRejected si le fichier est trop volumineux ou n'est pas une image.
+    """
+    if not file:
+        return None
+
+    with spooled_image(file, current_app.config['MAX_IMAGE_UPLOAD_BYTES']) as spooled:
         try:
-            # Upload du fichier au Storage
-            supabase.storage.from_(STORAGE_BUCKET).upload(storage_path, file_content, file_options={"content-type": file.mimetype})
-            # Récupérer l'URL publique
-            public_url = supabase.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
-            return public_url
+            public_url = upload_image_to_supabase(spooled, product_id)
         except Exception as e:
             print(f"Erreur d'upload Supabase: {e}")
             return None
-    return None
+
+        # Décodage et redimensionnement hors de la boucle gevent
+        variants = run_cpu_bound(generate_variants, spooled['path'])
+
+    base_path = f"produits/{product_id}/{uuid.uuid4()}"
+
+    def upload_variant(variant):
+        storage_path = f"{base_path}_{variant['name']}.{'jpg' if variant['format'] == 'jpeg' else 'webp'}"
+        supabase.storage.from_(STORAGE_BUCKET).upload(storage_path, variant['content'], file_options={"content-type": variant['content_type']})
+        return supabase.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
+
+    variantes = {}
+    try:
+        # Les variantes sont envoyées en parallèle
+        urls = fan_out(*[(lambda v=variant: upload_variant(v)) for variant in variants])
+        for variant, variant_url in zip(variants, urls):
+            entry = variantes.setdefault(variant['name'], {'width': variant['width'], 'height': variant['height']})
+            entry[variant['format']] = variant_url
+    except Exception as e:
+        # L'original est en ligne : on continue sans variantes plutôt que d'échouer
+        print(f"Erreur d'upload des variantes Supabase: {e}")
+        variantes = {}
+
+    return {'url': public_url, 'variantes': variantes or None}
+
+def save_main_image(product_id, uploaded, replace=False):
+    """
+    Enregistre l'image principale dans images_produits et sa copie dénormalisée sur le produit
+    (main_image_url, main_image_variantes) : les listes lisent une seule ligne par produit, sans jointure.
+    """
+    if replace:
+        # Mise à jour de l'URL existante (et de ses variantes)
+        supabase.table('images_produits').update({'url': uploaded['url'], 'variantes': uploaded['variantes']}) \
+            .eq('produit_id', product_id).eq('est_principale', True).execute()
+    else:
+        supabase.table('images_produits').insert({
+            'produit_id': product_id,
+            'url': uploaded['url'],
+            'variantes': uploaded['variantes'],
+            'est_principale': True
+        }).execute()
+    supabase.table('produits').update({'main_image_url': uploaded['url'], 'main_image_variantes': uploaded['variantes']}) \
+        .eq('id', product_id).execute()
+
+def image_sources(image, preferred='card'):
+    """URL à afficher + srcset JPEG/WebP pour une ligne images_produits (variantes si disponibles)."""
+    variantes = image.get('variantes') or {}
+    return {
+        'url': pick_variant_url(variantes, preferred) or image['url'],
+        'srcset': build_srcset(variantes, 'jpeg'),
+        'webp_srcset': build_srcset(variantes, 'webp'),
+    }
 
 try:
-    from assistant_data import get_assistant_response 
+    from assistant_data import get_assistant_response, get_assistant_responses, get_cache_stats
 except ImportError:
     def get_assistant_response(question):
         return {"response": "L'assistant n'est pas configuré.", "intent": "none"}
 
+    def get_assistant_responses(questions):
+        return [get_assistant_response(question) for question in questions]
+
+    def get_cache_stats():
+        return {}
+
+# Nombre maximal de questions acceptées par appel à /api/assistant/batch
+MAX_ASSISTANT_BATCH = 500
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -125,7 +265,7 @@ def get_or_create_about_content():
     }
 
     try:
-        response = supabase.table(ABOUT_TABLE).select('*').limit(1).execute()
+        response = select_view(ABOUT_TABLE, 'about').limit(1).execute()
         
         if response.data and len(response.data) > 0:
             return response.data[0]
@@ -147,14 +287,49 @@ def get_or_create_about_content():
     return default_content
 
 # --- Fonctions de récupération de données ---
+
+# Cache du catalogue : évite la jointure produits + images_produits à chaque page vue
+# (durée de vie et taille fixées par create_app() depuis CATALOG_CACHE_TTL et CATALOG_CACHE_MAX_ENTRIES)
+catalog_cache = TTLCache()
+
+
+def invalidate_catalog_cache():
+    """À appeler après toute écriture sur les produits ou leurs images."""
+    catalog_cache.invalidate()
+
+
+def get_products_count():
+    """Nombre de produits, mis en cache et invalidé avec le catalogue."""
+    count = catalog_cache.get(('count', current_app.config['PRODUCTS_COUNT_MODE']), fetch_products_count)
+    return count if count is not None else 0
+
+
+def fetch_products_count():
+    """Requête de comptage seule (head=True : aucune ligne transférée). Retourne None en cas d'erreur."""
+    try:
+        products_count_res = supabase.table('produits') \
+            .select('id', count=current_app.config['PRODUCTS_COUNT_MODE'], head=True) \
+            .execute()
+        return products_count_res.count if products_count_res.count is not None else 0
+    except Exception as e:
+        print(f"DEBUG ERREUR Supabase (Comptage): {e}")
+        return None
+
+
 def get_products_with_images(limit=None): 
-    """Récupère tous les produits pour la page d'accueil ou l'administration."""
+    """Récupère tous les produits pour la page d'accueil ou l'administration (depuis le cache si possible)."""
+    products = catalog_cache.get(('products', limit), lambda: fetch_products_with_images(limit))
+    # Copie de la liste : l'appelant peut la filtrer sans toucher au cache
+    return list(products) if products is not None else []
+
+
+def fetch_products_with_images(limit=None):
+    """Requête Supabase du catalogue. Retourne None en cas d'erreur (non mis en cache)."""
     
-    query = supabase.table('produits')
-            
-    # Récupérer l'URL de l'image principale
-    select_string = "*, images_produits!inner(url, est_principale)" 
-    query = query.select(select_string)
+    # L'image principale est dénormalisée sur le produit : pas de jointure sur images_produits
+    query = select_view('produits', 'card').not_.is_('main_image_url', 'null')
+    # Tri stable : les plus récents d'abord
+    query = query.order('created_at', desc=True).order('id', desc=True)
     
     if limit:
         query = query.limit(limit) 
@@ -163,44 +338,281 @@ def get_products_with_images(limit=None):
         products_response = query.execute()
     except Exception as e:
         print(f"DEBUG ERREUR Supabase: Échec de l'exécution de la requête: {e}")
-        return []
+        return None
 
+    return build_product_list(products_response.data)
+
+
+def build_product_list(rows):
+    """Ajoute l'URL de l'image principale et le nom de catégorie à chaque ligne de produit."""
     products = []
-    if not products_response.data:
+    if not rows:
         return []
     
     category_map = {c['slug']: c['name'] for c in get_categories_list()}
 
-    for p in products_response.data:
-        image_data = p.pop('images_produits', None) 
-        image_url = None
+    for p in rows:
+        sources = None
         
-        # Logique de récupération de l'image principale
-        if image_data and isinstance(image_data, list):
-             main_image = next((img['url'] for img in image_data if img.get('est_principale', False)), None)
-             image_url = main_image
+        # Image principale dénormalisée (variante "card" pour les grilles)
+        if p.get('main_image_url'):
+            sources = image_sources({'url': p['main_image_url'], 'variantes': p.get('main_image_variantes')}, 'card')
         
-        p['image_url'] = image_url if image_url else url_for('static', filename='images/default_product.jpg')
+        p['image_url'] = sources['url'] if sources else url_for('static', filename='images/default_product.jpg')
+        p['image_srcset'] = sources['srcset'] if sources else ''
+        p['image_webp_srcset'] = sources['webp_srcset'] if sources else ''
         p['category_name'] = category_map.get(p.get('type'), 'Divers') 
         products.append(p)
     
     return products
 
+
+def encode_cursor(product):
+    """Curseur opaque pointant après ce produit (clé de tri : created_at, id)."""
+    raw = json.dumps([product.get('created_at'), str(product.get('id'))])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Retourne (created_at, id) ou None si le curseur est absent ou invalide.
+    Les deux valeurs sont normalisées (horodatage ISO, UUID) : elles entrent dans le filtre PostgREST
+    et dans la clé du cache, deux écritures d'une même position donnent la même clé.
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(str(created_at)).isoformat(), str(uuid.UUID(str(product_id)))
+    except Exception:
+        return None
+
+
+def get_products_page(category=None, cursor=None, page_size=CATEGORY_PAGE_SIZE, view='card'):
+    """
+    Une page du catalogue (éventuellement filtrée par catégorie) en pagination par curseur.
+    Retourne (produits, curseur_suivant) ; curseur_suivant vaut None sur la dernière page.
+    Mise en cache par (catégorie, position décodée, taille de page, vue) : la chaîne brute du curseur
+    n'entre pas dans la clé, un curseur invalide donne la première page (les routes le refusent avant).
+    """
+    position = decode_cursor(cursor)
+    result = catalog_cache.get(
+        ('page', category, position, page_size, view),
+        lambda: fetch_products_page(category, position, page_size, view)
+    )
+    if result is None:
+        return [], None
+    products, next_cursor = result
+    return list(products), next_cursor
+
+
+def fetch_products_page(category=None, position=None, page_size=CATEGORY_PAGE_SIZE, view='card'):
+    """
+    Requête Supabase d'une page (colonnes de la vue `view`) : tri (created_at, id) décroissant
+    et condition « strictement après la position (created_at, id) », sans OFFSET. Retourne None en cas d'erreur.
+    """
+    query = select_view('produits', view).not_.is_('main_image_url', 'null')
+
+    if category:
+        query = query.eq('type', category)
+
+    if position:
+        created_at, product_id = position
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{product_id}")'
+        )
+
+    # Une ligne de plus que la taille de page pour savoir s'il existe une page suivante
+    query = query.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1)
+
+    try:
+        products_response = query.execute()
+    except Exception as e:
+        print(f"DEBUG ERREUR Supabase (Pagination): Échec de l'exécution de la requête: {e}")
+        return None
+
+    rows = products_response.data or []
+    products = build_product_list(rows[:page_size])
+    next_cursor = encode_cursor(products[-1]) if len(rows) > page_size and products else None
+    return products, next_cursor
+
+def iter_catalog_rows(view='export', page_size=catalog_import.EXPORT_PAGE_SIZE):
+    """
+    Parcourt tout le catalogue (produits avec ou sans image) page par page, en pagination par curseur,
+    sans passer par le cache : une seule page est en mémoire à la fois.
+    """
+    position = None
+    while True:
+        query = select_view('produits', view)
+        if position:
+            created_at, product_id = position
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{product_id}")'
+            )
+        rows = query.order('created_at', desc=True).order('id', desc=True).limit(page_size).execute().data or []
+
+        yield from rows
+
+        if len(rows) < page_size:
+            return
+        position = (str(rows[-1]['created_at']), str(rows[-1]['id']))
+
+
+# Index de recherche en mémoire (voir product_search.py) : construit au premier usage,
+# reconstruit en arrière-plan après SEARCH_INDEX_TTL secondes et mis à jour à chaque écriture
+search_index = ProductSearchIndex({c['slug']: c['name'] for c in get_categories_list()})
+_search_index_refresh = Lock()
+# Après un échec de chargement (Supabase indisponible), délai en secondes avant une nouvelle tentative
+SEARCH_INDEX_RETRY_DELAY = 30
+_search_index_failed_at = None
+
+
+def rebuild_search_index():
+    """Recharge tout le catalogue dans l'index (l'ancien index reste servi en cas d'erreur)."""
+    global _search_index_failed_at
+    try:
+        rows = list(iter_catalog_rows(view='search'))
+    except Exception as e:
+        print(f"DEBUG ERREUR Supabase (Index de recherche): {e}")
+        _search_index_failed_at = time.monotonic()
+        return
+    _search_index_failed_at = None
+    search_index.rebuild(rows)
+    schedule_related_refresh()
+
+
+def search_index_retry_pending():
+    """Vrai pendant SEARCH_INDEX_RETRY_DELAY secondes après un échec de chargement."""
+    failed_at = _search_index_failed_at
+    return failed_at is not None and time.monotonic() - failed_at < SEARCH_INDEX_RETRY_DELAY
+
+
+def refresh_search_index_in_background():
+    """Lance le chargement de l'index dans un thread (rien si un chargement est déjà en cours)."""
+    if not _search_index_refresh.acquire(blocking=False):
+        return
+    app = current_app._get_current_object()
+
+    def refresh():
+        try:
+            with app.app_context():
+                rebuild_search_index()
+        finally:
+            _search_index_refresh.release()
+
+    Thread(target=refresh, name="search-index-refresh", daemon=True).start()
+
+
+def get_search_index(wait=True):
+    """
+    Index prêt à interroger ; une reconstruction expirée se fait sans bloquer la requête.
+    Le premier chargement bloque la requête, sauf avec wait=False : l'index (encore vide) est
+    alors retourné tout de suite et chargé en arrière-plan. Après un échec, aucune nouvelle
+    tentative avant SEARCH_INDEX_RETRY_DELAY secondes : les requêtes ne s'accumulent pas sur le verrou.
+    """
+    if search_index_retry_pending():
+        return search_index
+    if search_index.built_at is None:
+        if not wait:
+            refresh_search_index_in_background()
+            return search_index
+        with _search_index_refresh:
+            if search_index.built_at is None and not search_index_retry_pending():
+                rebuild_search_index()
+    elif time.monotonic() - search_index.built_at > current_app.config['SEARCH_INDEX_TTL']:
+        refresh_search_index_in_background()
+    return search_index
+
+
+def refresh_indexed_products(product_ids):
+    """Met à jour dans l'index les produits modifiés (une requête), sans reconstruire tout l'index."""
+    if search_index.built_at is None or not product_ids:
+        return
+    product_ids = [str(product_id) for product_id in product_ids]
+    try:
+        rows = select_view('produits', 'search').in_('id', product_ids).execute().data or []
+    except Exception as e:
+        print(f"DEBUG ERREUR Supabase (Index de recherche): {e}")
+        return
+    search_index.upsert(rows)
+    found = {str(row['id']) for row in rows}
+    for product_id in product_ids:
+        if product_id not in found:
+            search_index.remove(product_id)
+    schedule_related_refresh()
+
+
+# Produits similaires, recalculés en arrière-plan à partir de l'index de recherche
+related_products = RelatedProducts()
+_related_refresh = Lock()
+_related_pending = Event()
+
+
+def schedule_related_refresh():
+    """
+    Demande un recalcul des produits similaires, sans bloquer la requête.
+    Les demandes arrivées pendant un calcul sont regroupées en un seul recalcul suivant.
+    """
+    _related_pending.set()
+    if not _related_refresh.acquire(blocking=False):
+        return
+
+    def refresh():
+        try:
+            while _related_pending.is_set():
+                _related_pending.clear()
+                try:
+                    # Lecture de l'index dans le greenlet, calcul numpy / scikit-learn dans un thread système
+                    products = [product for product in search_index.products() if product.get('main_image_url')]
+                    run_cpu_bound(related_products.rebuild, products)
+                except Exception as e:
+                    print(f"DEBUG ERREUR Produits similaires: {e}")
+        finally:
+            _related_refresh.release()
+        # Demande arrivée entre la fin de la boucle et la libération du verrou
+        if _related_pending.is_set():
+            schedule_related_refresh()
+
+    Thread(target=refresh, name="related-products-refresh", daemon=True).start()
+
+
+def get_related_products(product_id, limit=4):
+    """
+    Produits similaires précalculés (lecture d'un dictionnaire, aucun calcul pendant la requête).
+    Prix et stock viennent de l'index de recherche du worker : ils peuvent dater de SEARCH_INDEX_TTL
+    pour une modification faite sur un autre worker.
+    """
+    # Jamais de chargement complet du catalogue pendant l'affichage d'une fiche : sans index,
+    # la page s'affiche sans produits similaires et l'index se charge en arrière-plan
+    catalog_index = get_search_index(wait=False)
+    related = []
+    for related_id in related_products.get(product_id)[:limit]:
+        product = catalog_index.get(related_id)
+        if product and product.get('main_image_url'):
+            related.append(product)
+    return build_product_list(related)
+
+
+def search_products(query, limit, public=True):
+    """Produits classés par pertinence ; la boutique n'affiche que les produits avec image (comme les listes)."""
+    predicate = (lambda product: bool(product.get('main_image_url'))) if public else None
+    return build_product_list(get_search_index().search(query, limit=limit, predicate=predicate))
+
 # --- Routes Publiques ---
-@app.route('/')
+@route('/')
 def index():
     """Page d'accueil : Affiche tous les produits (limité à 8)."""
     products = get_products_with_images(limit=8) 
     return render_template('index.html', products=products)
 
-@app.route('/product/<uuid:product_id>')
+@route('/product/<uuid:product_id>')
 def product_detail(product_id):
     """Affiche les détails d'un produit, y compris les images multiples."""
     str_product_id = str(product_id)
     
     try:
         # 1. Récupérer le produit (y compris le stock et toutes les images)
-        product_res = supabase.table('produits').select('*, images_produits(id, url, est_principale)').eq('id', str_product_id).single().execute()
+        product_res = select_view('produits', 'detail').eq('id', str_product_id).single().execute()
         product_data = product_res.data
         
         if not product_data:
@@ -210,25 +622,31 @@ def product_detail(product_id):
 
         # 2. Séparer l'image principale et les images de détail
         default_url = url_for('static', filename='images/default_product.jpg')
-        main_image = next((img['url'] for img in images_res if img.get('est_principale', False)), default_url)
+        main_image = next((img for img in images_res if img.get('est_principale', False)), None)
+        main_sources = image_sources(main_image, 'detail') if main_image else {'url': default_url, 'srcset': '', 'webp_srcset': ''}
         detail_images = [img for img in images_res if not img.get('est_principale', False)] # Garder l'ID pour la suppression future
+        for img in detail_images:
+            img['sources'] = image_sources(img, 'detail')
 
-        product_data['main_image'] = main_image
+        product_data['main_image'] = main_sources['url']
+        product_data['main_image_srcset'] = main_sources['srcset']
+        product_data['main_image_webp_srcset'] = main_sources['webp_srcset']
         product_data['detail_images'] = detail_images
 
         # Ajouter le nom de la catégorie pour l'affichage
         category_map = {c['slug']: c['name'] for c in get_categories_list()}
         product_data['category_name'] = category_map.get(product_data.get('type'), 'Divers') 
         
-        return render_template('product_detail.html', product=product_data)
+        return render_template('product_detail.html', product=product_data,
+                               related_products=get_related_products(str_product_id))
 
     except Exception as e:
         print(f"DEBUG ERREUR ROUTE DETAIL: {e}")
         return "Erreur lors de la récupération des détails du produit", 500
 
-@app.route('/category/<category_name>')
+@route('/category/<category_name>')
 def category_page(category_name):
-    """Affiche les produits par type en filtrant les données en Python."""
+    """Affiche les produits par type, filtrés et paginés (curseur) par Supabase."""
     
     category_titles = {
         'telephone': 'Téléphones 📱',
@@ -239,13 +657,12 @@ def category_page(category_name):
     if category_name not in category_titles:
         return redirect(url_for('index')) 
 
+    cursor = request.args.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        return redirect(url_for('category_page', category_name=category_name))
+
     try:
-        all_products = get_products_with_images() 
-        
-        filtered_products = [
-            p for p in all_products 
-            if p.get('type') == category_name
-        ]
+        filtered_products, next_cursor = get_products_page(category=category_name, cursor=cursor, view='category_card')
         
         template_name = 'category_view.html' 
 
@@ -253,7 +670,9 @@ def category_page(category_name):
             template_name, 
             products=filtered_products, 
             title=category_titles[category_name],
-            category=category_name
+            category=category_name,
+            cursor=cursor,
+            next_cursor=next_cursor
         )
     except Exception as e:
         print(f"DEBUG ERREUR ROUTE: Erreur lors de la récupération/filtrage des données: {e}")
@@ -264,8 +683,62 @@ def category_page(category_name):
             error=f"Erreur lors du traitement des produits: {e}"
         )
 
+@route('/api/products')
+def api_list_products():
+    """Liste JSON paginée : ?category=<slug>&cursor=<curseur>&limit=<n>."""
+    category = request.args.get('category') or None
+    if category and category not in {c['slug'] for c in get_categories_list()}:
+        return jsonify({"error": "Catégorie inconnue."}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        return jsonify({"error": "Curseur invalide."}), 400
+
+    page_size = request.args.get('limit', CATEGORY_PAGE_SIZE, type=int)
+    page_size = max(1, min(page_size, API_MAX_PAGE_SIZE))
+
+    products, next_cursor = get_products_page(category=category, cursor=cursor, page_size=page_size)
+    return jsonify({"products": products, "next_cursor": next_cursor})
+
+@route('/api/suggest')
+def api_suggest_products():
+    """Suggestions à la frappe : ?q=<début du nom>&limit=<n>, servies depuis l'index en mémoire."""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', SUGGEST_LIMIT, type=int), SUGGEST_MAX_LIMIT))
+    if not query:
+        return jsonify({"suggestions": []})
+
+    products = get_search_index().suggest(query, limit=limit, predicate=lambda product: bool(product.get('main_image_url')))
+    return jsonify({"suggestions": [
+        {
+            "id": product['id'],
+            "nom": product['nom'],
+            "prix_gnf": product.get('prix_gnf'),
+            "url": url_for('product_detail', product_id=product['id']),
+        }
+        for product in products
+    ]})
+
+@route('/search')
+def search_page():
+    """Recherche dans le catalogue : ?q=<texte>."""
+    query = request.args.get('q', '').strip()
+    products = search_products(query, limit=CATEGORY_PAGE_SIZE) if query else []
+    return render_template('search_results.html', products=products, query=query)
+
+@route('/api/search')
+def api_search_products():
+    """Recherche JSON : ?q=<texte>&limit=<n>, résultats classés par pertinence."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Paramètre 'q' manquant."}), 400
+
+    limit = request.args.get('limit', CATEGORY_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+    return jsonify({"products": search_products(query, limit=limit), "query": query})
+
 # --- Routes d'Authentification / Assistant ---
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     error = None
     if request.method == 'POST':
@@ -288,18 +761,18 @@ def login():
     return render_template('login.html', error=request.args.get('error'))
 
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     supabase.auth.sign_out()
     session.pop('user', None)
     return redirect(url_for('index'))
 
-@app.route('/cart')
+@route('/cart')
 def cart():
     """Page du Panier."""
     return render_template('cart.html')
 
-@app.route('/about')
+@route('/about')
 def about():
     """
     Page À Propos : Récupère le contenu modifiable depuis Supabase.
@@ -308,21 +781,15 @@ def about():
     return render_template('about.html', about_content=about_content)
 
 # --- NOUVELLE ROUTE ADMIN POUR ÉDITER LE CONTENU 'À PROPOS' (VÉRIFIÉE) ---
-@app.route('/admin/about/edit', methods=['GET', 'POST'])
+@route('/admin/about/edit', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_about():
     
-    about_content = get_or_create_about_content()
+    # edit_about.html hérite de dashboard.html : le compteur de produits est chargé en parallèle
+    about_content, products_count = fan_out(get_or_create_about_content, get_products_count)
     error = None
     success = None
     
-    # Récupérer products_count de manière sécurisée pour l'héritage du template admin
-    try:
-        products_count_res = supabase.table('produits').select('id', count='exact').execute()
-        products_count = products_count_res.count if products_count_res.count is not None else 0
-    except Exception:
-        products_count = 0 
-    
     if request.method == 'POST':
         try:
             updated_data = {
@@ -363,21 +830,13 @@ def admin_edit_about():
                            products_count=products_count)
 
 
-@app.route('/api/assistant', methods=['POST'])
-def handle_assistant():
-    data = request.get_json()
-    user_question = data.get('question', '')
-    
-    if not user_question:
-        return jsonify({"response": "Veuillez poser une question."})
-
-    response_data = get_assistant_response(user_question)
-    
+def format_assistant_response(response_data):
+    """Met en forme la réponse de l'assistant pour le JS (redirection secrète, contacts WhatsApp)."""
     if response_data["intent"] == "port_secrete":
-        return jsonify({
+        return {
             "response": "🔑 Accès Administrateur Déverrouillé. Redirection...",
             "redirect": url_for('login')
-        })
+        }
     # ✅ J'ajoute les numéros WhatsApp pour le JS
     if response_data["intent"] == "defaut":
         response_data["contact_wa"] = [
@@ -385,97 +844,200 @@ def handle_assistant():
             {"label": "Support Secondaire", "number": WHATSAPP_NUMBERS[1]}
         ]
         
-    return jsonify({
+    return {
         "response": response_data["response"],
         "intent": response_data["intent"],
-        "contact_wa": response_data.get("contact_wa", [])
-    })
+        "contact_wa": response_data.get("contact_wa", []),
+        "assistant_links": response_data.get("assistant_links", [])
+    }
+
+
+def answer_from_catalog(question, response_data):
+    """
+    Remplace la réponse d'intention par le prix et la disponibilité du produit cité, lus dans l'index
+    en mémoire (aucune requête Supabase par message), quand la question porte sur un produit :
+    prix ou stock demandé, ou question sans autre réponse que le contact WhatsApp.
+    """
+    if response_data["intent"] == "port_secrete":
+        return response_data
+    try:
+        match = match_product_question(question, get_search_index(),
+                                       predicate=lambda product: bool(product.get('main_image_url')))
+    except Exception as e:
+        print(f"DEBUG ERREUR Assistant (Catalogue): {e}")
+        return response_data
+    if match and (match["asks_price"] or match["asks_stock"] or response_data["intent"] in ("defaut", "prix_produit")):
+        return build_product_response(match, lambda product: url_for('product_detail', product_id=product['id']))
+    return response_data
 
 
-# --- NOUVELLE ROUTE API : ENREGISTRER LA COMMANDE (UNIFIÉ) ---
-@app.route('/api/order/submit', methods=['POST'])
-def submit_order():
+@route('/api/assistant', methods=['POST'])
+def handle_assistant():
     data = request.get_json()
-    cart_items = data.get('cart_items', [])
+    user_question = data.get('question', '')
     
-    if not cart_items:
-        return jsonify({"success": False, "message": "Le panier est vide."}), 400
-        
-    try:
-        # Enregistrer la commande
-        order_data = {
-            'produits_json': cart_items, # Stocke la liste des produits dans le panier
-            # Utilisez datetime.now().isoformat() pour le timestamp si 'now()' pose problème
-            'date_commande': datetime.now().isoformat(), 
-            'statut': 'En attente WhatsApp' # Statut initial
-        }
-        
-        response = supabase.table('commandes').insert(order_data).execute()
-        
-        if response.data:
-            order_id = response.data[0].get('id', 'N/A')
-            return jsonify({"success": True, "message": "Commande enregistrée en attente.", "order_id": order_id})
-        else:
-            raise Exception("Aucune donnée de commande retournée.")
+    if not user_question:
+        return jsonify({"response": "Veuillez poser une question."})
+
+    response_data = answer_from_catalog(user_question, get_assistant_response(user_question))
+    return jsonify(format_assistant_response(response_data))
+
+
+@route('/api/assistant/batch', methods=['POST'])
+def handle_assistant_batch():
+    """Classe plusieurs questions en un seul appel (rejeu de conversations, pré-calcul de la FAQ)."""
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        return jsonify({"error": "Le champ 'questions' doit être une liste de textes."}), 400
+    if len(questions) > MAX_ASSISTANT_BATCH:
+        return jsonify({"error": f"Maximum {MAX_ASSISTANT_BATCH} questions par appel."}), 400
+
+    results = []
+    for question, response_data in zip(questions, get_assistant_responses(questions)):
+        result = format_assistant_response(answer_from_catalog(question, response_data))
+        result["question"] = question
+        results.append(result)
+
+    return jsonify({"results": results})
+
+
+@route('/api/assistant/stats')
+@admin_required
+def assistant_cache_stats():
+    """Compteurs du cache de l'assistant (pour régler ASSISTANT_CACHE_SIZE)."""
+    return jsonify(get_cache_stats())
+
+
+@route('/api/supabase/stats')
+@admin_required
+def supabase_transport_stats():
+    """Utilisation du pool de connexions Supabase de ce worker."""
+    return jsonify(transport_stats(current_app.extensions['supabase_http']))
+
+
+# --- API : ENREGISTRER LA COMMANDE (appelée par recordOrderOnAPI avant l'envoi WhatsApp) ---
 
+def write_orders(orders):
+    """Insère un lot de commandes (appelé par le thread d'écriture)."""
+    supabase.table('commandes').insert(orders).execute()
+
+
+order_writer = OrderWriter(write_orders, max_pending=int(os.environ.get("ORDER_QUEUE_MAX", "1000")))
+# Les commandes encore en file sont écrites à l'arrêt du worker
+atexit.register(order_writer.close)
+
+
+def fetch_order_products(product_ids):
+    """Une requête `in_` sur (id, nom, prix_gnf) ; None en cas d'erreur Supabase."""
+    try:
+        rows = select_view('produits', 'order_line').in_('id', list(product_ids)).execute().data or []
     except Exception as e:
-        print(f"DEBUG ERREUR ENREGISTREMENT COMMANDE: {e}")
-        return jsonify({"success": False, "message": f"Erreur serveur: {e}"}), 500
+        print(f"DEBUG ERREUR Supabase (Prix des commandes): {e}")
+        return None
+    return {
+        str(row['id']): {'nom': row.get('nom') or '', 'prix_gnf': float(row['prix_gnf'])}
+        for row in rows if row.get('prix_gnf') is not None
+    }
+
+
+def order_products(product_ids):
+    """
+    Nom et prix catalogue {id: {nom, prix_gnf}} des produits commandés, lus dans la base à chaque commande
+    (une requête par panier, hors catalog_cache : chaque panier est différent et ses entrées
+    évinceraient les pages du catalogue). Si Supabase ne répond pas, l'index en mémoire
+    est utilisé pour ne pas perdre la commande.
+    """
+    # Identifiant envoyé -> identifiant normalisé ; un id malformé est simplement introuvable
+    # (il ferait échouer toute la requête PostgREST)
+    normalized = {}
+    for product_id in product_ids:
+        try:
+            normalized[product_id] = str(uuid.UUID(product_id))
+        except ValueError:
+            continue
+    if not normalized:
+        return {}
+
+    ids = sorted(set(normalized.values()))
+    products = fetch_order_products(ids)
+    if products is None:
+        catalog_index = get_search_index()
+        products = {}
+        for product_id in ids:
+            product = catalog_index.get(product_id)
+            if product is not None and product.get('prix_gnf') is not None:
+                products[product_id] = {'nom': product.get('nom') or '', 'prix_gnf': float(product['prix_gnf'])}
+
+    return {product_id: products[norm] for product_id, norm in normalized.items() if norm in products}
+
+
+@route('/api/enregistrer-commande', methods=['POST'])
+def record_order():
+    """
+    Valide la commande (prix recalculés depuis le catalogue) et la met en file d'écriture :
+    la réponse part sans attendre Supabase, le client peut ouvrir WhatsApp aussitôt.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else None
+    product_ids = [str(item.get('id') or '') for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+    try:
+        products = order_products(product_ids) if product_ids else {}
+        order, corrected = build_order(payload, products.get)
+    except OrderRejected as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    if not order_writer.submit(order):
+        print(f"DEBUG ERREUR ENREGISTREMENT COMMANDE: file pleine, commande {order['id']} refusée")
+        return jsonify({"success": False, "message": "Service momentanément surchargé."}), 503
+
+    return jsonify({
+        "success": True,
+        "message": "Commande enregistrée en attente.",
+        "order_id": order['id'],
+        "total_gnf": order['total_gnf'],
+        "prix_corriges": corrected,
+    }), 202
 
 
 # --- Routes Administrateur ---
 
-@app.route('/admin')
+@route('/admin')
 @admin_required
 def admin_dashboard():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    return render_template('admin/dashboard.html', products_count=products_count)
+    # Seul le tableau de bord affiche le compteur de produits (lu depuis le cache)
+    return render_template('admin/dashboard.html', products_count=get_products_count())
 
-@app.route('/admin/products', methods=['GET'])
+@route('/admin/products', methods=['GET'])
 @admin_required
 def admin_manage_products():
     search_query = request.args.get('search', '')
     
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
     if search_query:
         try:
-            products_response = supabase.table('produits').select("*, images_produits(url, est_principale)").like('nom', f'%{search_query}%').execute()
-            
-            products_data = products_response.data
-            products = []
-            category_map = {c['slug']: c['name'] for c in get_categories_list()}
-            
-            for p in products_data:
-                image_data = p.pop('images_produits', None) 
-                image_url = None
-                if image_data and isinstance(image_data, list):
-                    main_image = next((img['url'] for img in image_data if img.get('est_principale', False)), None)
-                    image_url = main_image
-                    
-                p['image_url'] = image_url if image_url else url_for('static', filename='images/default_product.jpg')
-                p['category_name'] = category_map.get(p.get('type'), 'Divers') 
-                products.append(p)
+            # Recherche plein texte (nom, description, type ; sans accents ni casse)
+            products = search_products(search_query, limit=ADMIN_PAGE_SIZE, public=False)
             
         except Exception as e:
             print(f"DEBUG ERREUR RECHERCHE: {e}")
             products = []
             
-        return render_template('admin/manage_products.html', products=products, search_query=search_query, products_count=products_count)
+        return render_template('admin/manage_products.html', products=products, search_query=search_query)
 
     else:
-        products = get_products_with_images()
-        return render_template('admin/manage_products.html', products=products, search_query=search_query, products_count=products_count)
+        cursor = request.args.get('cursor')
+        if cursor and decode_cursor(cursor) is None:
+            return redirect(url_for('admin_manage_products'))
+        products, next_cursor = get_products_page(cursor=cursor, page_size=ADMIN_PAGE_SIZE, view='admin_row')
+        return render_template('admin/manage_products.html', products=products, search_query=search_query,
+                               cursor=cursor, next_cursor=next_cursor)
 
 
-@app.route('/admin/products/add', methods=['GET', 'POST'])
+@route('/admin/products/add', methods=['GET', 'POST'])
 @admin_required
 def admin_add_product():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
     if request.method == 'POST':
         try:
             product_data = {
@@ -494,18 +1056,16 @@ def admin_add_product():
                 if 'image_file' in request.files and request.files['image_file'].filename != '':
                     file = request.files['image_file']
                     
-                    image_url = upload_image_to_supabase(file, product_id)
+                    uploaded = upload_product_image(file, product_id)
                     
-                    if image_url:
-                        # Insère l'image principale
-                        supabase.table('images_produits').insert({
-                            'produit_id': product_id,
-                            'url': image_url,
-                            'est_principale': True
-                        }).execute()
+                    if uploaded:
+                        # Insère l'image principale (avec ses variantes redimensionnées)
+                        save_main_image(product_id, uploaded)
                     else:
                         raise Exception("Échec de l'upload de l'image principale ou format non autorisé.")
                 
+                invalidate_catalog_cache()
+                refresh_indexed_products([product_id])
                 return redirect(url_for('admin_manage_products'))
             else:
                 error = f"Erreur lors de l'ajout du produit: {response.data}"
@@ -516,30 +1076,24 @@ def admin_add_product():
                                error=error,
                                product=None, 
                                current_image_url=None,
-                               products_count=products_count
                                ) 
         
-    return render_template('admin/add_product.html', product=None, current_image_url=None, products_count=products_count)
+    return render_template('admin/add_product.html', product=None, current_image_url=None)
 
 
-@app.route('/admin/products/edit/<uuid:product_id>', methods=['GET', 'POST'])
+@route('/admin/products/edit/<uuid:product_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_product(product_id):
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
     str_product_id = str(product_id)
     
-    # Récupération du produit
-    product_res = supabase.table('produits').select('*').eq('id', str_product_id).single().execute()
+    # Produit avec son image principale dénormalisée
+    product_res = select_view('produits', 'admin_form').eq('id', str_product_id).single().execute()
     product = product_res.data
     
     if not product:
         return "Produit non trouvé", 404
         
-    # Récupération de l'image principale actuelle pour l'affichage
-    current_image_res = supabase.table('images_produits').select('url').eq('produit_id', str_product_id).eq('est_principale', True).limit(1).execute().data
-    current_image_url = current_image_res[0]['url'] if current_image_res else ''
+    current_image_url = product.get('main_image_url') or ''
         
     if request.method == 'POST':
         try:
@@ -557,49 +1111,42 @@ def admin_edit_product(product_id):
             if 'image_file' in request.files and request.files['image_file'].filename != '':
                 file = request.files['image_file']
                 
-                new_image_url = upload_image_to_supabase(file, str_product_id)
+                uploaded = upload_product_image(file, str_product_id)
                 
-                if new_image_url:
-                    if current_image_url:
-                        # Mise à jour de l'URL existante
-                        supabase.table('images_produits').update({'url': new_image_url}).eq('produit_id', str_product_id).eq('est_principale', True).execute()
-                    else:
-                        # Insertion si l'image principale n'existait pas
-                        supabase.table('images_produits').insert({
-                            'produit_id': str_product_id,
-                            'url': new_image_url,
-                            'est_principale': True
-                        }).execute()
+                if uploaded:
+                    # Mise à jour de l'image existante, ou insertion si le produit n'en avait pas
+                    save_main_image(str_product_id, uploaded, replace=bool(current_image_url))
                 else:
                     raise Exception("Échec de l'upload de l'image principale ou format non autorisé.")
 
+            refresh_indexed_products([str_product_id])
             return redirect(url_for('admin_manage_products'))
             
         except Exception as e:
             error = f"Erreur lors de la modification: {e}"
-            return render_template('admin/add_product.html', product=product, error=error, current_image_url=current_image_url, products_count=products_count)
+            return render_template('admin/add_product.html', product=product, error=error, current_image_url=current_image_url)
+        finally:
+            # Une seule invalidation, y compris si l'image échoue après la mise à jour du produit
+            invalidate_catalog_cache()
             
-    return render_template('admin/add_product.html', product=product, current_image_url=current_image_url, products_count=products_count) 
+    return render_template('admin/add_product.html', product=product, current_image_url=current_image_url) 
 
 
-@app.route('/admin/orders')
+@route('/admin/orders')
 @admin_required
 def admin_manage_orders():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
     try:
-        orders_res = supabase.table('commandes').select('*').order('date_commande', desc=True).execute()
+        orders_res = select_view('commandes', 'order_summary').order('date_commande', desc=True).execute()
         orders = orders_res.data
         
-        return render_template('admin/manage_orders.html', orders=orders, products_count=products_count)
+        return render_template('admin/manage_orders.html', orders=orders)
 
     except Exception as e:
         print(f"DEBUG ERREUR GESTION COMMANDES: {e}")
-        return render_template('admin/manage_orders.html', orders=[], error=f"Erreur de connexion à la base de données: {e}", products_count=products_count)
+        return render_template('admin/manage_orders.html', orders=[], error=f"Erreur de connexion à la base de données: {e}")
 
 
-@app.route('/admin/orders/update_status/<uuid:order_id>', methods=['POST'])
+@route('/admin/orders/update_status/<uuid:order_id>', methods=['POST'])
 @admin_required
 def admin_update_order_status(order_id):
     new_status = request.form.get('status')
@@ -613,22 +1160,20 @@ def admin_update_order_status(order_id):
         return f"Erreur lors de la mise à jour: {e}", 500
 
 
-@app.route('/admin/products/images/<uuid:product_id>', methods=['GET', 'POST'])
+@route('/admin/products/images/<uuid:product_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_manage_detail_images(product_id):
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
     str_product_id = str(product_id)
     
-    # 1. Récupérer le produit et les images existantes
-    product_res = supabase.table('produits').select('nom').eq('id', str_product_id).single().execute()
+    # 1. Récupérer en parallèle le produit et les images existantes
+    product_res, current_detail_images_res = fan_out(
+        lambda: supabase.table('produits').select('nom').eq('id', str_product_id).single().execute(),
+        lambda: supabase.table('images_produits').select('id, url, est_principale').eq('produit_id', str_product_id).eq('est_principale', False).execute().data,
+    )
     product = product_res.data
     
     if not product:
         return "Produit non trouvé", 404
-        
-    current_detail_images_res = supabase.table('images_produits').select('id, url, est_principale').eq('produit_id', str_product_id).eq('est_principale', False).execute().data
     
     error = None
 
@@ -637,21 +1182,27 @@ def admin_manage_detail_images(product_id):
         if 'detail_image_file' in request.files and request.files['detail_image_file'].filename != '':
             detail_file = request.files['detail_image_file']
             
-            new_detail_image_url = upload_image_to_supabase(detail_file, str_product_id)
+            try:
+                uploaded = upload_product_image(detail_file, str_product_id)
+            except UploadRejected as e:
+                uploaded = None
+                error = str(e)
             
-            if new_detail_image_url:
+            if uploaded:
                 try:
                     # Insère la nouvelle image comme image de détail
                     supabase.table('images_produits').insert({
                         'produit_id': str_product_id,
-                        'url': new_detail_image_url,
+                        'url': uploaded['url'],
+                        'variantes': uploaded['variantes'],
                         'est_principale': False # C'est une image de détail
                     }).execute()
+                    invalidate_catalog_cache()
                     # Redirection GET pour effacer le POST et actualiser la liste
                     return redirect(url_for('admin_manage_detail_images', product_id=product_id)) 
                 except Exception as e:
                     error = f"Erreur d'enregistrement dans la base de données: {e}"
-            else:
+            elif error is None:
                 error = "Échec de l'upload de l'image ou format non autorisé."
         else:
             error = "Veuillez sélectionner un fichier à télécharger."
@@ -661,11 +1212,10 @@ def admin_manage_detail_images(product_id):
                            product=product, 
                            product_id=product_id,
                            detail_images=current_detail_images_res,
-                           error=error,
-                           products_count=products_count)
+                           error=error)
 
 
-@app.route('/admin/images/delete_detail/<uuid:image_id>', methods=['POST'])
+@route('/admin/images/delete_detail/<uuid:image_id>', methods=['POST'])
 @admin_required
 def admin_delete_image_detail(image_id):
     try:
@@ -676,6 +1226,7 @@ def admin_delete_image_detail(image_id):
             product_id = image_data['produit_id']
             
             supabase.table('images_produits').delete().eq('id', str(image_id)).execute()
+            invalidate_catalog_cache()
             
             return redirect(url_for('admin_manage_detail_images', product_id=product_id))
         else:
@@ -686,711 +1237,263 @@ def admin_delete_image_detail(image_id):
         return "Erreur lors de la suppression de l'image", 500
 
 
-@app.route('/admin/products/delete/<uuid:product_id>', methods=['POST'])
+@route('/admin/products/delete/<uuid:product_id>', methods=['POST'])
 @admin_required
 def admin_delete_product(product_id):
     supabase.table('produits').delete().eq('id', str(product_id)).execute()
+    invalidate_catalog_cache()
+    search_index.remove(product_id)
+    schedule_related_refresh()
     return redirect(url_for('admin_manage_products'))
 
 
-if __name__ == '__main__':
-    # REMPLACÉ PAR LA LIGNE GUNICORN DANS LE PROCFILE LORS DU DÉPLOIEMENT
-    # app.run(debug=True)
-    # Laissez cette ligne pour le test local si nécessaire, mais Render utilisera Gunicorn.
-    pass
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-from supabase import create_client, Client
-from functools import wraps
-import os
-import uuid 
-import io 
-from werkzeug.utils import secure_filename 
-from flask import url_for 
-from datetime import datetime
-
-# ===================================================================
-# --- MODIFICATIONS CRUCIALES POUR LE DÉPLOIEMENT ---
-
-# 1. Lire l'URL et la clé Supabase depuis les variables d'environnement
-#    Render/Heroku vous demandera de définir ces variables.
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_ANON_KEY") 
-# NOTE: Nous utilisons "SUPABASE_ANON_KEY" pour la clarté, 
-# même si le nom était "SUPABASE_KEY" avant.
-
-# Initialisation du client Supabase
-# Si les clés ne sont pas définies (par exemple, en local sans fichier .env), le programme plantera ici.
-# Ce comportement est normal en déploiement.
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# --- Configuration Flask ---
-app = Flask(__name__)
-
-# 2. Rendre la clé secrète OBLIGATOIREMENT lue de l'environnement
-#    La valeur par défaut est supprimée pour forcer son utilisation en production.
-app.secret_key = os.environ.get("FLASK_SECRET_KEY") 
-
-app.config['SUPABASE_URL'] = SUPABASE_URL
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+def upload_import_images(images, images_by_name, archive):
+    """
+    Upload concurrent vers le Storage des images (lues dans le zip) d'un lot importé.
+    Retourne ({id du produit: image envoyée}, erreurs).
+    """
+    def upload(product_id, image_name):
+        try:
+            with archive.open(images_by_name[image_name]) as image_file:
+                uploaded = upload_product_image(image_file, product_id)
+            return uploaded, None if uploaded else "échec de l'upload"
+        except Exception as e:
+            return None, str(e)
 
-# --- FIN DES MODIFICATIONS CRUCIALES ---
-# ===================================================================
+    # images : liste de (ligne, id du produit, nom du fichier dans le zip)
+    results = fan_out(*[(lambda job=job: upload(job[1], job[2])) for job in images],
+                      executor=catalog_import.IMPORT_IMAGE_EXECUTOR)
 
-STORAGE_BUCKET = "images_produits"
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    errors = []
+    uploaded_images = {}
+    for (line, product_id, image_name), (uploaded, error) in zip(images, results):
+        if uploaded:
+            uploaded_images[product_id] = uploaded
+        else:
+            errors.append({'ligne': line, 'erreurs': [f"image « {image_name} » : {error} (ligne non importée)"]})
+    return uploaded_images, errors
 
-# ✅ Numéros WhatsApp pour la commande (sans le '+' pour l'API wa.me)
-WHATSAPP_NUMBERS = [
-    "224621822134", 
-    "224625480987"
-]
-PRIMARY_WHATSAPP_NUMBER = WHATSAPP_NUMBERS[0] if WHATSAPP_NUMBERS else None
 
+def upsert_import_batch(products, uploaded_images):
+    """
+    Upsert groupé d'un lot importé, image principale dénormalisée comprise, puis remplacement
+    groupé des lignes images_produits (une suppression et une insertion pour tout le lot).
+    """
+    # Un upsert par forme de ligne : PostgREST applique les colonnes de la première ligne à tout le lot
+    # (une colonne absente d'une ligne de mise à jour doit rester inchangée, pas devenir NULL)
+    rows_by_columns = {}
+    for product in products:
+        uploaded = uploaded_images.get(product['id'])
+        if uploaded:
+            product = {**product, 'main_image_url': uploaded['url'], 'main_image_variantes': uploaded['variantes']}
+        # Sans image dans l'import : l'image principale existante est conservée
+        rows_by_columns.setdefault(tuple(sorted(product)), []).append(product)
+
+    for rows in rows_by_columns.values():
+        supabase.table('produits').upsert(rows).execute()
+
+    if uploaded_images:
+        supabase.table('images_produits').delete() \
+            .in_('produit_id', list(uploaded_images)).eq('est_principale', True).execute()
+        supabase.table('images_produits').insert([
+            {'produit_id': product_id, 'url': uploaded['url'], 'variantes': uploaded['variantes'], 'est_principale': True}
+            for product_id, uploaded in uploaded_images.items()
+        ]).execute()
+
+
+def run_product_import(rows_stream, file_format, archive):
+    """
+    Import en flux : validation ligne par ligne, images du lot en parallèle, upsert groupé par lot.
+    Génère une ligne JSON de progression après chaque lot, puis un bilan final.
+    """
+    try:
+        yield from _run_product_import(rows_stream, file_format, archive)
+    finally:
+        rows_stream.close()
+        if archive:
+            # ZipFile ne ferme pas un flux qu'il n'a pas ouvert lui-même
+            images_stream = archive.fp
+            archive.close()
+            images_stream.close()
+
+
+def _run_product_import(rows_stream, file_format, archive):
+    progress = {'lignes': 0, 'produits': 0, 'images': 0, 'erreurs': 0}
+    try:
+        yield from _import_batches(rows_stream, file_format, archive, progress)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Fichier illisible en cours de lecture (ex. CSV Excel en Latin-1) : le lot en cours est abandonné
+        print(f"DEBUG ERREUR Import (lecture du fichier): {e}")
+        progress['erreurs'] += 1
+        detail = {'ligne': progress['lignes'] + 1,
+                  'erreurs': [f"fichier illisible, import interrompu (le fichier doit être enregistré en UTF-8) : {e}"]}
+        yield json.dumps({**progress, 'details': [detail], 'termine': True}, ensure_ascii=False) + "\n"
+        return
+
+    yield json.dumps({**progress, 'termine': True}, ensure_ascii=False) + "\n"
+
+
+def _import_batches(rows_stream, file_format, archive, progress):
+    category_slugs = {c['slug'] for c in get_categories_list()}
+    images_by_name = {}
+    if archive:
+        images_by_name = {os.path.basename(info.filename): info for info in archive.infolist() if not info.is_dir()}
+
+    seen_ids = set()
+
+    for batch in catalog_import.iter_batches(catalog_import.iter_rows(rows_stream, file_format)):
+        products = []
+        images = []
+        errors = []
+
+        for line, row, error in batch:
+            progress['lignes'] += 1
+            if error:
+                errors.append({'ligne': line, 'erreurs': [error]})
+                continue
+            product, image_name, row_errors = catalog_import.validate_row(row, category_slugs)
+            if not row_errors and product['id'] in seen_ids:
+                row_errors = [f"id « {product['id']} » présent plusieurs fois dans le fichier"]
+            if not row_errors and image_name and image_name not in images_by_name:
+                row_errors = [f"image « {image_name} » absente du zip"]
+            if row_errors:
+                errors.append({'ligne': line, 'erreurs': row_errors})
+                continue
+            seen_ids.add(product['id'])
+            products.append(product)
+            if image_name:
+                images.append((line, product['id'], image_name))
+
+        # Les images partent d'abord vers le Storage : leurs URLs sont écrites avec les produits
+        uploaded_images = {}
+        if images:
+            uploaded_images, image_errors = upload_import_images(images, images_by_name, archive)
+            errors.extend(image_errors)
+            # Une ligne dont l'image a échoué n'est pas enregistrée (elle figure dans les erreurs)
+            failed_ids = {product_id for _, product_id, _ in images if product_id not in uploaded_images}
+            products = [product for product in products if product['id'] not in failed_ids]
+
+        if products:
+            try:
+                upsert_import_batch(products, uploaded_images)
+                refresh_indexed_products([product['id'] for product in products])
+                progress['produits'] += len(products)
+                progress['images'] += len(uploaded_images)
+            except Exception as e:
+                print(f"DEBUG ERREUR Supabase (Import): {e}")
+                errors.append({'ligne': batch[0][0], 'erreurs': [f"lot de {len(products)} produits refusé : {e}"]})
+
+        progress['erreurs'] += len(errors)
+        invalidate_catalog_cache()
+        yield json.dumps({**progress, 'details': errors}, ensure_ascii=False) + "\n"
+
+
+@route('/admin/products/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import_products():
+    if request.method == 'GET':
+        return render_template('admin/import_products.html')
+
+    # Le fichier de lignes et le zip d'images dépassent la limite des formulaires classiques
+    request.max_content_length = current_app.config['IMPORT_MAX_CONTENT_LENGTH']
+
+    rows_file = request.files.get('rows_file')
+    if not rows_file or rows_file.filename == '':
+        return jsonify({"error": "Veuillez sélectionner un fichier CSV ou JSONL."}), 400
+    file_format = catalog_import.detect_format(rows_file.filename)
+    if file_format is None:
+        return jsonify({"error": "Format non reconnu : fichier .csv ou .jsonl attendu."}), 400
+
+    archive = None
+    images_zip = request.files.get('images_zip')
+    if images_zip and images_zip.filename != '':
+        try:
+            archive = zipfile.ZipFile(catalog_import.detach_upload(images_zip))
+        except zipfile.BadZipFile:
+            return jsonify({"error": "L'archive d'images n'est pas un fichier zip valide."}), 400
 
-# --- LOGIQUE DES CATÉGORIES ---
+    # Progression envoyée au fil de l'import (une ligne JSON par lot)
+    rows_stream = catalog_import.detach_upload(rows_file)
+    return Response(stream_with_context(run_product_import(rows_stream, file_format, archive)),
+                    mimetype='application/x-ndjson')
 
-def get_categories_list():
-    """Retourne la liste des catégories/types de produits."""
-    return [
-        {'name': 'Téléphones', 'slug': 'telephone', 'icon': '📱'},
-        {'name': 'Ordinateurs', 'slug': 'ordinateur', 'icon': '💻'},
-        {'name': 'Accessoires', 'slug': 'accessoire', 'icon': '🎧'},
-    ]
 
-@app.context_processor
-def inject_globals():
-    """Rend les types de produits et le numéro WhatsApp PRINCIPAL disponibles globalement dans les templates Jinja."""
-    return dict(
-        categories=get_categories_list(),
-        # Injecter le numéro principal pour base.html et cart.html
-        whatsapp_number=PRIMARY_WHATSAPP_NUMBER 
-    )
-
-
-# --- Fonctions utilitaires ---
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def upload_image_to_supabase(file, product_id):
-    if file and allowed_file(file.filename):
-        file_extension = file.filename.rsplit('.', 1)[1].lower()
-        # Générer un nom de fichier unique
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        # Chemin de stockage: produits/<ID_produit>/<NOM_UNIQUE>.ext
-        storage_path = f"produits/{product_id}/{unique_filename}" 
-        
-        file.seek(0)
-        file_content = file.read()
-        
-        try:
-            # Upload du fichier au Storage
-            supabase.storage.from_(STORAGE_BUCKET).upload(storage_path, file_content, file_options={"content-type": file.mimetype})
-            # Récupérer l'URL publique
-            public_url = supabase.storage.from_(STORAGE_BUCKET).get_public_url(storage_path)
-            return public_url
-        except Exception as e:
-            print(f"Erreur d'upload Supabase: {e}")
-            return None
-    return None
-
-try:
-    from assistant_data import get_assistant_response 
-except ImportError:
-    def get_assistant_response(question):
-        return {"response": "L'assistant n'est pas configuré.", "intent": "none"}
-
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        user = session.get('user')
-        if not user:
-            return redirect(url_for('login', error="Accès refusé. Veuillez vous connecter pour accéder à l'administration."))
-        return f(*args, **kwargs)
-    return decorated_function
-
-# --- NOUVEAUX ÉLÉMENTS POUR LE CONTENU 'À PROPOS' ---
-ABOUT_TABLE = 'about_page_content' 
-
-def get_or_create_about_content():
-    """Récupère l'unique ligne de contenu 'À Propos' ou la crée par défaut."""
-    
-    default_content = {
-        'mission_title': "Notre Mission : La Tech Facile en Guinée",
-        'mission_text': "Bienvenue chez Bon Coin Bon Prix ! Notre concept est simple : rendre la technologie de qualité (téléphones, ordinateurs, accessoires) accessible à tous, sans compromis sur le prix. Nous sélectionnons chaque article pour son authenticité et sa durabilité, vous garantissant le Bon Prix pour le Bon Coin.",
-        'commitment_title': "Notre Engagement Qualité",
-        'commitment_list_text': "Produits 100% Authentiques, Prix Justes et Compétitifs, Service Client Local, Livraison Fiable",
-        'whatsapp_number': PRIMARY_WHATSAPP_NUMBER,
-        'email': "contact@boncoinbonprix.com"
-    }
-
-    try:
-        response = supabase.table(ABOUT_TABLE).select('*').limit(1).execute()
-        
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-            
-    except Exception as e:
-        print(f"DEBUG ERREUR Supabase (About): Échec de la récupération du contenu: {e}")
-
-    try:
-        insert_response = supabase.table(ABOUT_TABLE).insert(default_content).execute()
-        
-        if insert_response.data:
-            print("Entrée 'À Propos' par défaut créée sur Supabase.")
-            return insert_response.data[0] 
-        
-    except Exception as e:
-        print(f"DEBUG AVERTISSEMENT: Échec de l'insertion par défaut (la table n'existe peut-être pas ou RLS est activé). Utilisation des valeurs locales.")
-        pass 
-        
-    return default_content
-
-# --- Fonctions de récupération de données ---
-def get_products_with_images(limit=None): 
-    """Récupère tous les produits pour la page d'accueil ou l'administration."""
-    
-    query = supabase.table('produits')
-            
-    # Récupérer l'URL de l'image principale
-    select_string = "*, images_produits!inner(url, est_principale)" 
-    query = query.select(select_string)
-    
-    if limit:
-        query = query.limit(limit) 
-
-    try:
-        products_response = query.execute()
-    except Exception as e:
-        print(f"DEBUG ERREUR Supabase: Échec de l'exécution de la requête: {e}")
-        return []
-
-    products = []
-    if not products_response.data:
-        return []
-    
-    category_map = {c['slug']: c['name'] for c in get_categories_list()}
-
-    for p in products_response.data:
-        image_data = p.pop('images_produits', None) 
-        image_url = None
-        
-        # Logique de récupération de l'image principale
-        if image_data and isinstance(image_data, list):
-             main_image = next((img['url'] for img in image_data if img.get('est_principale', False)), None)
-             image_url = main_image
-        
-        p['image_url'] = image_url if image_url else url_for('static', filename='images/default_product.jpg')
-        p['category_name'] = category_map.get(p.get('type'), 'Divers') 
-        products.append(p)
-    
-    return products
-
-# --- Routes Publiques ---
-@app.route('/')
-def index():
-    """Page d'accueil : Affiche tous les produits (limité à 8)."""
-    products = get_products_with_images(limit=8) 
-    return render_template('index.html', products=products)
-
-@app.route('/product/<uuid:product_id>')
-def product_detail(product_id):
-    """Affiche les détails d'un produit, y compris les images multiples."""
-    str_product_id = str(product_id)
-    
-    try:
-        # 1. Récupérer le produit (y compris le stock et toutes les images)
-        product_res = supabase.table('produits').select('*, images_produits(id, url, est_principale)').eq('id', str_product_id).single().execute()
-        product_data = product_res.data
-        
-        if not product_data:
-            return "Produit non trouvé", 404
-            
-        images_res = product_data.pop('images_produits', [])
-
-        # 2. Séparer l'image principale et les images de détail
-        default_url = url_for('static', filename='images/default_product.jpg')
-        main_image = next((img['url'] for img in images_res if img.get('est_principale', False)), default_url)
-        detail_images = [img for img in images_res if not img.get('est_principale', False)] # Garder l'ID pour la suppression future
-
-        product_data['main_image'] = main_image
-        product_data['detail_images'] = detail_images
-
-        # Ajouter le nom de la catégorie pour l'affichage
-        category_map = {c['slug']: c['name'] for c in get_categories_list()}
-        product_data['category_name'] = category_map.get(product_data.get('type'), 'Divers') 
-        
-        return render_template('product_detail.html', product=product_data)
-
-    except Exception as e:
-        print(f"DEBUG ERREUR ROUTE DETAIL: {e}")
-        return "Erreur lors de la récupération des détails du produit", 500
-
-@app.route('/category/<category_name>')
-def category_page(category_name):
-    """Affiche les produits par type en filtrant les données en Python."""
-    
-    category_titles = {
-        'telephone': 'Téléphones 📱',
-        'ordinateur': 'Ordinateurs 💻',
-        'accessoire': 'Accessoires 🎧'
-    }
-    
-    if category_name not in category_titles:
-        return redirect(url_for('index')) 
-
-    try:
-        all_products = get_products_with_images() 
-        
-        filtered_products = [
-            p for p in all_products 
-            if p.get('type') == category_name
-        ]
-        
-        template_name = 'category_view.html' 
-
-        return render_template(
-            template_name, 
-            products=filtered_products, 
-            title=category_titles[category_name],
-            category=category_name
-        )
-    except Exception as e:
-        print(f"DEBUG ERREUR ROUTE: Erreur lors de la récupération/filtrage des données: {e}")
-        return render_template(
-            'category_view.html', 
-            products=[], 
-            title=category_titles.get(category_name, 'Catégorie'), 
-            error=f"Erreur lors du traitement des produits: {e}"
-        )
-
-# --- Routes d'Authentification / Assistant ---
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    error = None
-    if request.method == 'POST':
-        email = request.form.get('email')
-        password = request.form.get('password')
-        try:
-            user_response = supabase.auth.sign_in_with_password({"email": email, "password": password})
-            user_data = user_response.user
-            
-            if user_data:
-                session['user'] = {'id': user_data.id, 'email': user_data.email} 
-                return redirect(url_for('admin_dashboard'))
-            else:
-                error = "Email ou mot de passe incorrect."
-        except Exception as e:
-            error_message = str(e)
-            error = f"Erreur d'authentification : {error_message}"
-        
-        return render_template('login.html', error=error)
-    return render_template('login.html', error=request.args.get('error'))
-
-
-@app.route('/logout')
-def logout():
-    supabase.auth.sign_out()
-    session.pop('user', None)
-    return redirect(url_for('index'))
-
-@app.route('/cart')
-def cart():
-    """Page du Panier."""
-    return render_template('cart.html')
-
-@app.route('/about')
-def about():
-    """
-    Page À Propos : Récupère le contenu modifiable depuis Supabase.
-    """
-    about_content = get_or_create_about_content()
-    return render_template('about.html', about_content=about_content)
-
-# --- NOUVELLE ROUTE ADMIN POUR ÉDITER LE CONTENU 'À PROPOS' (VÉRIFIÉE) ---
-@app.route('/admin/about/edit', methods=['GET', 'POST'])
+@route('/admin/products/export')
 @admin_required
-def admin_edit_about():
-    
-    about_content = get_or_create_about_content()
-    error = None
-    success = None
-    
-    # Récupérer products_count de manière sécurisée pour l'héritage du template admin
-    try:
-        products_count_res = supabase.table('produits').select('id', count='exact').execute()
-        products_count = products_count_res.count if products_count_res.count is not None else 0
-    except Exception:
-        products_count = 0 
-    
-    if request.method == 'POST':
-        try:
-            updated_data = {
-                'mission_title': request.form['mission_title'],
-                'mission_text': request.form['mission_text'],
-                'commitment_title': request.form['commitment_title'],
-                'commitment_list_text': request.form['commitment_list_text'],
-                'whatsapp_number': request.form['whatsapp_number'],
-                'email': request.form['email']
-            }
-            
-            # Mise à jour de la première (et unique) ligne
-            if 'id' in about_content:
-                supabase.table(ABOUT_TABLE).update(updated_data).eq('id', about_content['id']).execute()
-            else:
-                supabase.table(ABOUT_TABLE).update(updated_data).limit(1).execute() 
-                
-            success = "Le contenu de la page 'À Propos' a été mis à jour avec succès !"
-            # Redirection après le POST pour éviter l'envoi multiple
-            return redirect(url_for('admin_edit_about', success=success)) 
-
-        except Exception as e:
-            error = f"Erreur lors de la mise à jour du contenu: {e}"
-            # Utiliser les données du formulaire en cas d'erreur
-            about_content = about_content.copy() 
-            about_content.update(request.form)
-    
-    # Recharger le contenu mis à jour si on revient avec un succès dans l'URL (GET)
-    if request.args.get('success'):
-        success = request.args.get('success')
-        about_content = get_or_create_about_content()
-        
-
-    return render_template('admin/edit_about.html', 
-                           about_content=about_content,
-                           error=error,
-                           success=success,
-                           products_count=products_count)
-
-
-@app.route('/api/assistant', methods=['POST'])
-def handle_assistant():
-    data = request.get_json()
-    user_question = data.get('question', '')
-    
-    if not user_question:
-        return jsonify({"response": "Veuillez poser une question."})
-
-    response_data = get_assistant_response(user_question)
-    
-    if response_data["intent"] == "port_secrete":
-        return jsonify({
-            "response": "🔑 Accès Administrateur Déverrouillé. Redirection...",
-            "redirect": url_for('login')
-        })
-    # ✅ J'ajoute les numéros WhatsApp pour le JS
-    if response_data["intent"] == "defaut":
-        response_data["contact_wa"] = [
-            {"label": "Support Principal", "number": WHATSAPP_NUMBERS[0]},
-            {"label": "Support Secondaire", "number": WHATSAPP_NUMBERS[1]}
-        ]
-        
-    return jsonify({
-        "response": response_data["response"],
-        "intent": response_data["intent"],
-        "contact_wa": response_data.get("contact_wa", [])
-    })
-
-
-# --- NOUVELLE ROUTE API : ENREGISTRER LA COMMANDE (UNIFIÉ) ---
-@app.route('/api/order/submit', methods=['POST'])
-def submit_order():
-    data = request.get_json()
-    cart_items = data.get('cart_items', [])
-    
-    if not cart_items:
-        return jsonify({"success": False, "message": "Le panier est vide."}), 400
-        
-    try:
-        # Enregistrer la commande
-        order_data = {
-            'produits_json': cart_items, # Stocke la liste des produits dans le panier
-            # Utilisez datetime.now().isoformat() pour le timestamp si 'now()' pose problème
-            'date_commande': datetime.now().isoformat(), 
-            'statut': 'En attente WhatsApp' # Statut initial
-        }
-        
-        response = supabase.table('commandes').insert(order_data).execute()
-        
-        if response.data:
-            order_id = response.data[0].get('id', 'N/A')
-            return jsonify({"success": True, "message": "Commande enregistrée en attente.", "order_id": order_id})
-        else:
-            raise Exception("Aucune donnée de commande retournée.")
-
-    except Exception as e:
-        print(f"DEBUG ERREUR ENREGISTREMENT COMMANDE: {e}")
-        return jsonify({"success": False, "message": f"Erreur serveur: {e}"}), 500
-
-
-# --- Routes Administrateur ---
-
-@app.route('/admin')
-@admin_required
-def admin_dashboard():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    return render_template('admin/dashboard.html', products_count=products_count)
-
-@app.route('/admin/products', methods=['GET'])
-@admin_required
-def admin_manage_products():
-    search_query = request.args.get('search', '')
-    
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
-    if search_query:
-        try:
-            products_response = supabase.table('produits').select("*, images_produits(url, est_principale)").like('nom', f'%{search_query}%').execute()
-            
-            products_data = products_response.data
-            products = []
-            category_map = {c['slug']: c['name'] for c in get_categories_list()}
-            
-            for p in products_data:
-                image_data = p.pop('images_produits', None) 
-                image_url = None
-                if image_data and isinstance(image_data, list):
-                    main_image = next((img['url'] for img in image_data if img.get('est_principale', False)), None)
-                    image_url = main_image
-                    
-                p['image_url'] = image_url if image_url else url_for('static', filename='images/default_product.jpg')
-                p['category_name'] = category_map.get(p.get('type'), 'Divers') 
-                products.append(p)
-            
-        except Exception as e:
-            print(f"DEBUG ERREUR RECHERCHE: {e}")
-            products = []
-            
-        return render_template('admin/manage_products.html', products=products, search_query=search_query, products_count=products_count)
-
-    else:
-        products = get_products_with_images()
-        return render_template('admin/manage_products.html', products=products, search_query=search_query, products_count=products_count)
-
-
-@app.route('/admin/products/add', methods=['GET', 'POST'])
-@admin_required
-def admin_add_product():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
-    if request.method == 'POST':
-        try:
-            product_data = {
-                'nom': request.form['nom'],
-                'description': request.form['description'],
-                'prix_gnf': float(request.form['prix']),
-                'type': request.form['type'],
-                'stock': int(request.form.get('stock', 0)),
-            }
-            response = supabase.table('produits').insert(product_data).execute()
-            
-            if response.data and response.data[0].get('id'):
-                product_id = str(response.data[0]['id'])
-                
-                # Gestion de l'image principale
-                if 'image_file' in request.files and request.files['image_file'].filename != '':
-                    file = request.files['image_file']
-                    
-                    image_url = upload_image_to_supabase(file, product_id)
-                    
-                    if image_url:
-                        # Insère l'image principale
-                        supabase.table('images_produits').insert({
-                            'produit_id': product_id,
-                            'url': image_url,
-                            'est_principale': True
-                        }).execute()
-                    else:
-                        raise Exception("Échec de l'upload de l'image principale ou format non autorisé.")
-                
-                return redirect(url_for('admin_manage_products'))
-            else:
-                error = f"Erreur lors de l'ajout du produit: {response.data}"
-        except Exception as e:
-            error = f"Erreur: {e}"
-        
-        return render_template('admin/add_product.html', 
-                               error=error,
-                               product=None, 
-                               current_image_url=None,
-                               products_count=products_count
-                               ) 
-        
-    return render_template('admin/add_product.html', product=None, current_image_url=None, products_count=products_count)
-
-
-@app.route('/admin/products/edit/<uuid:product_id>', methods=['GET', 'POST'])
-@admin_required
-def admin_edit_product(product_id):
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
-    str_product_id = str(product_id)
-    
-    # Récupération du produit
-    product_res = supabase.table('produits').select('*').eq('id', str_product_id).single().execute()
-    product = product_res.data
-    
-    if not product:
-        return "Produit non trouvé", 404
-        
-    # Récupération de l'image principale actuelle pour l'affichage
-    current_image_res = supabase.table('images_produits').select('url').eq('produit_id', str_product_id).eq('est_principale', True).limit(1).execute().data
-    current_image_url = current_image_res[0]['url'] if current_image_res else ''
-        
-    if request.method == 'POST':
-        try:
-            product_data = {
-                'nom': request.form['nom'],
-                'description': request.form['description'],
-                'prix_gnf': float(request.form['prix']),
-                'type': request.form['type'],
-                'stock': int(request.form.get('stock', 0)),
-            }
-            # Mise à jour des données du produit
-            supabase.table('produits').update(product_data).eq('id', str_product_id).execute()
-            
-            # LOGIQUE D'UPLOAD DE L'IMAGE PRINCIPALE
-            if 'image_file' in request.files and request.files['image_file'].filename != '':
-                file = request.files['image_file']
-                
-                new_image_url = upload_image_to_supabase(file, str_product_id)
-                
-                if new_image_url:
-                    if current_image_url:
-                        # Mise à jour de l'URL existante
-                        supabase.table('images_produits').update({'url': new_image_url}).eq('produit_id', str_product_id).eq('est_principale', True).execute()
-                    else:
-                        # Insertion si l'image principale n'existait pas
-                        supabase.table('images_produits').insert({
-                            'produit_id': str_product_id,
-                            'url': new_image_url,
-                            'est_principale': True
-                        }).execute()
-                else:
-                    raise Exception("Échec de l'upload de l'image principale ou format non autorisé.")
-
-            return redirect(url_for('admin_manage_products'))
-            
-        except Exception as e:
-            error = f"Erreur lors de la modification: {e}"
-            return render_template('admin/add_product.html', product=product, error=error, current_image_url=current_image_url, products_count=products_count)
-            
-    return render_template('admin/add_product.html', product=product, current_image_url=current_image_url, products_count=products_count) 
-
-
-@app.route('/admin/orders')
-@admin_required
-def admin_manage_orders():
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
-    try:
-        orders_res = supabase.table('commandes').select('*').order('date_commande', desc=True).execute()
-        orders = orders_res.data
-        
-        return render_template('admin/manage_orders.html', orders=orders, products_count=products_count)
-
-    except Exception as e:
-        print(f"DEBUG ERREUR GESTION COMMANDES: {e}")
-        return render_template('admin/manage_orders.html', orders=[], error=f"Erreur de connexion à la base de données: {e}", products_count=products_count)
-
-
-@app.route('/admin/orders/update_status/<uuid:order_id>', methods=['POST'])
-@admin_required
-def admin_update_order_status(order_id):
-    new_status = request.form.get('status')
-    if not new_status:
-        return "Statut manquant", 400
-        
-    try:
-        supabase.table('commandes').update({'statut': new_status}).eq('id', str(order_id)).execute()
-        return redirect(url_for('admin_manage_orders'))
-    except Exception as e:
-        return f"Erreur lors de la mise à jour: {e}", 500
-
-
-@app.route('/admin/products/images/<uuid:product_id>', methods=['GET', 'POST'])
-@admin_required
-def admin_manage_detail_images(product_id):
-    products_count_res = supabase.table('produits').select('id', count='exact').execute()
-    products_count = products_count_res.count if products_count_res.count is not None else 0
-    
-    str_product_id = str(product_id)
-    
-    # 1. Récupérer le produit et les images existantes
-    product_res = supabase.table('produits').select('nom').eq('id', str_product_id).single().execute()
-    product = product_res.data
-    
-    if not product:
-        return "Produit non trouvé", 404
-        
-    current_detail_images_res = supabase.table('images_produits').select('id, url, est_principale').eq('produit_id', str_product_id).eq('est_principale', False).execute().data
-    
-    error = None
-
-    if request.method == 'POST':
-        # 2. LOGIQUE D'UPLOAD D'UNE NOUVELLE IMAGE DE DÉTAIL
-        if 'detail_image_file' in request.files and request.files['detail_image_file'].filename != '':
-            detail_file = request.files['detail_image_file']
-            
-            new_detail_image_url = upload_image_to_supabase(detail_file, str_product_id)
-            
-            if new_detail_image_url:
-                try:
-                    # Insère la nouvelle image comme image de détail
-                    supabase.table('images_produits').insert({
-                        'produit_id': str_product_id,
-                        'url': new_detail_image_url,
-                        'est_principale': False # C'est une image de détail
-                    }).execute()
-                    # Redirection GET pour effacer le POST et actualiser la liste
-                    return redirect(url_for('admin_manage_detail_images', product_id=product_id)) 
-                except Exception as e:
-                    error = f"Erreur d'enregistrement dans la base de données: {e}"
-            else:
-                error = "Échec de l'upload de l'image ou format non autorisé."
-        else:
-            error = "Veuillez sélectionner un fichier à télécharger."
-
-    # Affichage du formulaire et des images existantes
-    return render_template('admin/manage_detail_images.html', 
-                           product=product, 
-                           product_id=product_id,
-                           detail_images=current_detail_images_res,
-                           error=error,
-                           products_count=products_count)
-
-
-@app.route('/admin/images/delete_detail/<uuid:image_id>', methods=['POST'])
-@admin_required
-def admin_delete_image_detail(image_id):
-    try:
-        image_res = supabase.table('images_produits').select('produit_id').eq('id', str(image_id)).single().execute()
-        image_data = image_res.data
-        
-        if image_data:
-            product_id = image_data['produit_id']
-            
-            supabase.table('images_produits').delete().eq('id', str(image_id)).execute()
-            
-            return redirect(url_for('admin_manage_detail_images', product_id=product_id))
-        else:
-             return "Image non trouvée", 404
-
-    except Exception as e:
-        print(f"DEBUG ERREUR SUPPRESSION IMAGE: {e}")
-        return "Erreur lors de la suppression de l'image", 500
-
-
-@app.route('/admin/products/delete/<uuid:product_id>', methods=['POST'])
-@admin_required
-def admin_delete_product(product_id):
-    supabase.table('produits').delete().eq('id', str(product_id)).execute()
-    return redirect(url_for('admin_manage_products'))
+def admin_export_products():
+    file_format = request.args.get('format', 'csv')
+    if file_format not in ('csv', 'jsonl'):
+        return jsonify({"error": "Format inconnu : 'csv' ou 'jsonl'."}), 400
+
+    def generate():
+        yield catalog_import.export_header(file_format)
+        for product in iter_catalog_rows():
+            product['image_url'] = product.pop('main_image_url', None) or ''
+            yield catalog_import.export_line(product, file_format)
+
+    filename = f"catalogue-{datetime.now().strftime('%Y%m%d-%H%M')}.{file_format}"
+    return Response(stream_with_context(generate()),
+                    mimetype='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+# --- FABRIQUE D'APPLICATION ---
+
+def create_app():
+    """Crée l'application Flask, son client Supabase unique et enregistre les routes une seule fois."""
+    global supabase
+
+    # --- Configuration Flask ---
+    app = Flask(__name__)
+
+    # 2. Rendre la clé secrète OBLIGATOIREMENT lue de l'environnement
+    #    La valeur par défaut est supprimée pour forcer son utilisation en production.
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY") 
+
+    app.config['SUPABASE_URL'] = SUPABASE_URL
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    # Taille maximale d'une image (vérifiée pendant la copie sur disque) et seuil de l'upload résumable
+    app.config['MAX_IMAGE_UPLOAD_BYTES'] = int(os.environ.get("MAX_IMAGE_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    app.config['STORAGE_RESUMABLE_THRESHOLD'] = int(os.environ.get("STORAGE_RESUMABLE_THRESHOLD", str(6 * 1024 * 1024)))
+    # Limite de la requête d'import en masse (fichier de lignes + zip d'images)
+    app.config['IMPORT_MAX_CONTENT_LENGTH'] = int(os.environ.get("IMPORT_MAX_CONTENT_LENGTH", str(512 * 1024 * 1024)))
+    # Durée de vie (secondes) du cache du catalogue en mémoire ; 0 pour le désactiver
+    app.config['CATALOG_CACHE_TTL'] = int(os.environ.get("CATALOG_CACHE_TTL", "60"))
+    # Nombre maximal d'entrées du cache (les moins récemment utilisées sont évincées)
+    app.config['CATALOG_CACHE_MAX_ENTRIES'] = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", "512"))
+    # Mode de comptage des produits pour l'administration : 'exact', 'planned' ou 'estimated'
+    app.config['PRODUCTS_COUNT_MODE'] = os.environ.get("PRODUCTS_COUNT_MODE", "exact")
+    # Durée (secondes) après laquelle l'index de recherche en mémoire est reconstruit depuis Supabase
+    # (les écritures de ce worker le mettent à jour immédiatement ; celles des autres workers après ce délai)
+    app.config['SEARCH_INDEX_TTL'] = int(os.environ.get("SEARCH_INDEX_TTL", "300"))
+
+    # Initialisation du client Supabase
+    # Si les clés ne sont pas définies (par exemple, en local sans fichier .env), le programme plantera ici.
+    # Ce comportement est normal en déploiement.
+    # Un seul pool HTTP keep-alive (HTTP/2 si disponible) partagé par PostgREST, Storage et Auth
+    transport_config = load_transport_config()
+    http_client = build_http_client(transport_config)
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY, options=SyncClientOptions(
+        httpx_client=http_client,
+        postgrest_client_timeout=transport_config["timeout"],
+        storage_client_timeout=transport_config["timeout"],
+    ))
+    app.extensions['supabase'] = supabase
+    app.extensions['supabase_http'] = http_client
+
+    catalog_cache.ttl = app.config['CATALOG_CACHE_TTL']
+    catalog_cache.max_entries = app.config['CATALOG_CACHE_MAX_ENTRIES']
+
+    for processor in _CONTEXT_PROCESSORS:
+        app.context_processor(processor)
+    for rule, view_func, options in _ROUTES:
+        app.add_url_rule(rule, view_func=view_func, **options)
+
+    return app
+
+
+# Point d'entrée Gunicorn : main:app
+app = create_app()
 
 
 if __name__ == '__main__':
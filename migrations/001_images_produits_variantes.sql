@@ -0,0 +1,4 @@
+-- Variantes redimensionnées des images produits (voir image_variants.py).
+-- Format : {"thumb": {"width": 320, "height": 240, "jpeg": "<url>", "webp": "<url>"}, "card": {...}, "detail": {...}}
+ALTER TABLE images_produits
+    ADD COLUMN IF NOT EXISTS variantes jsonb;
@@ -0,0 +1,21 @@
+-- Image principale dénormalisée sur produits : les listes du catalogue lisent une ligne
+-- par produit sans jointure sur images_produits. Maintenue par l'application
+-- (ajout / modification de produit, import en masse).
+ALTER TABLE produits ADD COLUMN IF NOT EXISTS main_image_url text;
+ALTER TABLE produits ADD COLUMN IF NOT EXISTS main_image_variantes jsonb;
+
+-- Reprise des images principales existantes
+UPDATE produits p
+SET main_image_url = i.url,
+    main_image_variantes = i.variantes
+FROM images_produits i
+WHERE i.produit_id = p.id
+  AND i.est_principale;
+
+-- Pagination par curseur des listes (seuls les produits avec image y figurent)
+CREATE INDEX IF NOT EXISTS produits_listing_idx
+    ON produits (created_at DESC, id DESC)
+    WHERE main_image_url IS NOT NULL;
+CREATE INDEX IF NOT EXISTS produits_type_listing_idx
+    ON produits (type, created_at DESC, id DESC)
+    WHERE main_image_url IS NOT NULL;
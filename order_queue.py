@@ -0,0 +1,187 @@
+# order_queue.py
+#
+# Enregistrement des commandes du panier : validation de la commande envoyée par le navigateur
+# (prix recalculés côté serveur), puis écriture différée par une file et un thread d'écriture,
+# pour que le passage sur WhatsApp n'attende pas Supabase. Les appels Supabase restent dans main.py.
+import json
+import queue
+import time
+import uuid
+from datetime import datetime
+from threading import Thread
+
+# Limites d'une commande
+MAX_ORDER_ITEMS = 50
+MAX_ITEM_QUANTITY = 100
+MAX_CLIENT_FIELD_LENGTH = 120
+
+# Commandes écrites par requête Supabase, et attente maximale pour compléter un lot
+ORDER_BATCH_SIZE = 20
+ORDER_BATCH_WAIT = 0.2
+# Nouvelles tentatives d'écriture d'un lot (délai doublé à chaque fois)
+ORDER_WRITE_RETRIES = 4
+ORDER_RETRY_DELAY = 1.0
+
+ORDER_INITIAL_STATUS = "En attente WhatsApp"
+
+
+class OrderRejected(ValueError):
+    """Commande invalide ; le message est renvoyé au client."""
+
+
+def _client_field(payload, key, label):
+    value = str(payload.get(key) or "").strip()
+    if not value:
+        raise OrderRejected(f"{label} manquant.")
+    return value[:MAX_CLIENT_FIELD_LENGTH]
+
+
+def _quantity(value):
+    """Quantité entière envoyée par le navigateur (2, 2.0 ou "2") ; None si elle n'est pas entière."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def build_order(payload, product_of):
+    """
+    Valide le corps envoyé par recordOrderOnAPI ({items, clientName, clientQuartier, grandTotal})
+    et retourne (commande, ids_des_prix_corrigés).
+    `product_of(id)` donne le produit catalogue ({nom, prix_gnf}, None s'il n'existe pas) : son nom et
+    son prix font foi, le prix et le total envoyés par le navigateur ne servent qu'à signaler un écart.
+    """
+    if not isinstance(payload, dict):
+        raise OrderRejected("Un objet JSON est attendu.")
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        raise OrderRejected("Le panier est vide.")
+    if len(items) > MAX_ORDER_ITEMS:
+        raise OrderRejected(f"Trop d'articles (maximum {MAX_ORDER_ITEMS}).")
+
+    client_name = _client_field(payload, "clientName", "Nom du client")
+    client_quartier = _client_field(payload, "clientQuartier", "Quartier")
+
+    lines = []
+    corrected = []
+    total = 0.0
+    for item in items:
+        if not isinstance(item, dict):
+            raise OrderRejected("Article invalide.")
+        product_id = str(item.get("id") or "")
+        quantity = _quantity(item.get("quantity"))
+        if quantity is None or not 1 <= quantity <= MAX_ITEM_QUANTITY:
+            raise OrderRejected(f"Quantité invalide pour « {item.get('nom') or product_id} ».")
+
+        product = product_of(product_id)
+        if product is None:
+            raise OrderRejected(f"Produit introuvable : « {item.get('nom') or product_id} ».")
+        price = product["prix_gnf"]
+        try:
+            client_price = float(item.get("prix"))
+        except (TypeError, ValueError):
+            client_price = None
+        if client_price != price:
+            corrected.append(product_id)
+
+        # Mêmes clés que celles affichées dans l'administration des commandes
+        lines.append({"id": product_id, "name": product["nom"], "price": price, "quantity": quantity})
+        total += price * quantity
+
+    try:
+        if float(payload.get("grandTotal")) != total:
+            print(f"AVERTISSEMENT Commande : total client {payload.get('grandTotal')} ≠ total catalogue {total}")
+    except (TypeError, ValueError):
+        pass
+
+    order = {
+        "id": str(uuid.uuid4()),
+        "client_name": client_name,
+        "client_quartier": client_quartier,
+        "produits_json": lines,
+        "total_gnf": total,
+        "date_commande": datetime.now().isoformat(),
+        "statut": ORDER_INITIAL_STATUS,
+    }
+    return order, corrected
+
+
+class OrderWriter:
+    """
+    File des commandes à enregistrer, vidée par un thread unique qui les écrit par lots.
+    `write_batch(commandes)` fait l'insertion (lève une exception en cas d'échec) ;
+    un lot qui échoue est retenté, puis journalisé en entier pour une saisie manuelle.
+    """
+
+    def __init__(self, write_batch, max_pending=1000):
+        self.write_batch = write_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="order-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, order):
+        """Met la commande en file ; retourne False si la file est pleine."""
+        self.start()
+        try:
+            self._queue.put_nowait(order)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self, timeout=10):
+        """Écrit les commandes encore en file (à l'arrêt du worker)."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        """Attend une commande, puis complète le lot avec celles arrivées peu après."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + ORDER_BATCH_WAIT
+        while len(batch) < ORDER_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                order = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if order is None:
+                # Arrêt demandé : écrire ce lot puis s'arrêter
+                self._queue.put(None)
+                break
+            batch.append(order)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        delay = ORDER_RETRY_DELAY
+        for attempt in range(ORDER_WRITE_RETRIES + 1):
+            try:
+                self.write_batch(batch)
+                return
+            except Exception as e:
+                print(f"DEBUG ERREUR ENREGISTREMENT COMMANDE (tentative {attempt + 1}): {e}")
+                if attempt < ORDER_WRITE_RETRIES:
+                    time.sleep(delay)
+                    delay *= 2
+        for order in batch:
+            print(f"ERREUR Commande non enregistrée : {json.dumps(order, ensure_ascii=False)}")
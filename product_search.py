@@ -0,0 +1,370 @@
+# product_search.py
+#
+# Recherche plein texte des produits en mémoire : index inversé sur nom + description + type,
+# texte replié (minuscules, sans accents), classement BM25 pondéré par champ ;
+# suggestions de saisie par préfixe sur les noms (tableau trié + bisection).
+# L'index est reconstruit périodiquement et mis à jour produit par produit lors des écritures.
+import math
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from threading import RLock
+
+# Poids de chaque champ dans le score (un mot du nom compte plus qu'un mot de la description)
+FIELD_WEIGHTS = {"nom": 3.0, "type": 1.5, "description": 1.0}
+
+# Paramètres BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Un mot de la requête absent du vocabulaire est complété par préfixe (saisie en cours)
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 20
+PREFIX_WEIGHT = 0.8
+
+STOP_WORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "d", "de", "des", "du", "en", "et", "l", "la", "le",
+    "les", "pour", "sur", "un", "une",
+}
+
+# Formes élidées ("c'est", "qu'il", "j'ai"...) : jamais prises pour un mot d'un nom de produit
+ELIDED_WORDS = {"c", "j", "qu", "n", "s", "m", "t", "l", "d"}
+# Longueur minimale d'un mot de nom de produit cité dans une phrase
+MIN_NAME_TERM_LENGTH = 2
+# Un mot « distinctif » suffit à citer un produit ("iphone") ; les nombres et mots courts
+# ("128", "go", "pro") ne comptent que si une part suffisante du nom est citée
+MIN_DISTINCTIVE_LENGTH = 3
+
+
+def fold_text(text):
+    """Minuscules, accents retirés, ponctuation remplacée par des espaces."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", " ", without_accents).strip()
+
+
+def stem(token):
+    """Pluriel simple retiré ('téléphones' et 'telephone' donnent le même terme)."""
+    if len(token) > 3 and token[-1] in "sx" and not token[-2].isdigit():
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Termes indexables d'un texte (repliés, sans mots vides)."""
+    return [stem(token) for token in fold_text(text).split() if token not in STOP_WORDS]
+
+
+def is_name_term(term):
+    """Vrai si le terme peut désigner un mot d'un nom de produit (ni élision, ni lettre isolée)."""
+    return len(term) >= MIN_NAME_TERM_LENGTH and term not in ELIDED_WORDS
+
+
+def is_distinctive_term(term):
+    """Vrai si le terme suffit à lui seul à citer un produit (pas un nombre ni un mot court)."""
+    return len(term) >= MIN_DISTINCTIVE_LENGTH and not term.isdigit()
+
+
+class PrefixSuggestIndex:
+    """
+    Suggestions « à la frappe » : tableau trié des noms repliés, et de leurs fins à partir de chaque mot
+    ('iphone 13 pro', '13 pro', 'pro'), interrogé par bisection sur le préfixe saisi.
+    """
+
+    def __init__(self):
+        # Entrées (clé, position du mot, longueur du nom, id du produit), triées
+        self._entries = []
+        self._keys_by_product = {}
+
+    def _entries_for(self, product_id, name):
+        words = fold_text(name).split()
+        length = len(words)
+        return [(" ".join(words[position:]), position, length, product_id) for position in range(length)]
+
+    def add(self, product_id, name, bulk=False):
+        """Ajoute un nom ; avec bulk=True, l'appelant trie ensuite une seule fois (voir sort())."""
+        entries = self._entries_for(product_id, name)
+        self._keys_by_product[product_id] = entries
+        if bulk:
+            self._entries.extend(entries)
+        else:
+            for entry in entries:
+                insort(self._entries, entry)
+
+    def sort(self):
+        self._entries.sort()
+
+    def remove(self, product_id):
+        for entry in self._keys_by_product.pop(product_id, []):
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def lookup(self, prefix, limit):
+        """
+        Identifiants des produits dont un mot du nom commence par `prefix` (déjà replié) :
+        d'abord ceux dont le nom commence par le préfixe, puis les noms les plus courts.
+        """
+        if not prefix:
+            return []
+        matches = {}
+        for index in range(bisect_left(self._entries, (prefix,)), len(self._entries)):
+            key, position, length, product_id = self._entries[index]
+            if not key.startswith(prefix):
+                break
+            rank = (position > 0, length)
+            if product_id not in matches or rank < matches[product_id]:
+                matches[product_id] = rank
+        return sorted(matches, key=lambda product_id: matches[product_id])[:limit]
+
+
+class ProductSearchIndex:
+    """
+    Index inversé des produits. Les documents sont les lignes de produits elles-mêmes :
+    la recherche renvoie directement les produits, sans requête Supabase.
+    """
+
+    def __init__(self, type_labels=None):
+        # Libellé affiché de chaque type (ex. 'telephone' -> 'Téléphones'), indexé avec le type
+        self.type_labels = type_labels or {}
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self._products = {}
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._postings = {}
+        self._total_length = 0.0
+        self._vocabulary = None
+        self._suggestions = PrefixSuggestIndex()
+        # Termes du nom seul (reconnaissance d'un produit cité dans une phrase)
+        self._name_terms = {}
+        self._name_postings = {}
+        self.built_at = None
+
+    # --- Construction ---
+
+    def rebuild(self, products):
+        """
+        Remplace tout le contenu de l'index. Le nouvel index est construit à part puis substitué :
+        les recherches en cours continuent sur l'ancien pendant la construction.
+        """
+        fresh = ProductSearchIndex(self.type_labels)
+        for product in products:
+            fresh._add(product, bulk=True)
+        fresh._suggestions.sort()
+        with self._lock:
+            self._products = fresh._products
+            self._doc_terms = fresh._doc_terms
+            self._doc_lengths = fresh._doc_lengths
+            self._postings = fresh._postings
+            self._total_length = fresh._total_length
+            self._vocabulary = None
+            self._suggestions = fresh._suggestions
+            self._name_terms = fresh._name_terms
+            self._name_postings = fresh._name_postings
+            self.built_at = time.monotonic()
+
+    def upsert(self, products):
+        """Ajoute ou remplace des produits (après un ajout, une modification ou un import)."""
+        with self._lock:
+            for product in products:
+                self._remove(str(product["id"]))
+                self._add(product)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(str(product_id))
+
+    def _document_terms(self, product):
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            text = product.get(field) or ""
+            if field == "type":
+                text = f"{text} {self.type_labels.get(text, '')}"
+            for term in tokenize(text):
+                terms[term] = terms.get(term, 0.0) + weight
+        return terms
+
+    def _add(self, product, bulk=False):
+        product_id = str(product["id"])
+        terms = self._document_terms(product)
+        self._suggestions.add(product_id, product.get("nom") or "", bulk=bulk)
+        name_terms = {term for term in tokenize(product.get("nom") or "") if is_name_term(term)}
+        self._name_terms[product_id] = name_terms
+        for term in name_terms:
+            self._name_postings.setdefault(term, set()).add(product_id)
+        self._products[product_id] = dict(product)
+        self._doc_terms[product_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[product_id] = length
+        self._total_length += length
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocabulary = None
+            postings[product_id] = frequency
+
+    def _remove(self, product_id):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        self._products.pop(product_id, None)
+        self._suggestions.remove(product_id)
+        for term in self._name_terms.pop(product_id, ()):
+            holders = self._name_postings.get(term)
+            if holders is not None:
+                holders.discard(product_id)
+                if not holders:
+                    del self._name_postings[term]
+        self._total_length -= self._doc_lengths.pop(product_id, 0.0)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary = None
+
+    # --- Lecture ---
+
+    def __len__(self):
+        return len(self._products)
+
+    def get(self, product_id):
+        """Copie du produit indexé, ou None."""
+        with self._lock:
+            product = self._products.get(str(product_id))
+            return dict(product) if product else None
+
+    def products(self):
+        """Copie de tous les produits indexés."""
+        with self._lock:
+            return [dict(product) for product in self._products.values()]
+
+    def _expand(self, term):
+        """Termes du vocabulaire commençant par `term` (vocabulaire trié, recherche par bisection)."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect_left(self._vocabulary, term)
+        expansions = []
+        for candidate in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            expansions.append(candidate)
+        return expansions
+
+    def search(self, query, limit=20, predicate=None):
+        """
+        Produits classés par pertinence : d'abord ceux qui contiennent le plus de mots de la requête,
+        puis par score BM25. `predicate(produit)` permet d'écarter des résultats.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            document_count = len(self._products)
+            if not document_count:
+                return []
+            average_length = self._total_length / document_count
+
+            scores = {}
+            matched = {}
+            for query_term in query_terms:
+                if query_term in self._postings:
+                    candidates = [(query_term, 1.0)]
+                elif len(query_term) >= MIN_PREFIX_LENGTH:
+                    candidates = [(term, PREFIX_WEIGHT) for term in self._expand(query_term)]
+                else:
+                    candidates = []
+
+                term_scores = {}
+                for term, term_weight in candidates:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for product_id, frequency in postings.items():
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[product_id] / average_length)
+                        score = term_weight * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                        # Un mot de la requête ne compte qu'une fois, par son meilleur terme
+                        term_scores[product_id] = max(term_scores.get(product_id, 0.0), score)
+
+                for product_id, score in term_scores.items():
+                    scores[product_id] = scores.get(product_id, 0.0) + score
+                    matched[product_id] = matched.get(product_id, 0) + 1
+
+            ranked = sorted(scores, key=lambda product_id: (-matched[product_id], -scores[product_id]))
+            results = []
+            for product_id in ranked:
+                product = self._products[product_id]
+                if predicate is not None and not predicate(product):
+                    continue
+                results.append(dict(product))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def suggest(self, prefix, limit=8, predicate=None):
+        """Produits dont un mot du nom commence par le texte saisi (sans requête ni calcul de score)."""
+        folded = fold_text(prefix)
+        with self._lock:
+            results = []
+            # Marge pour les produits écartés par le filtre
+            candidates = self._suggestions.lookup(folded, limit * 4 if predicate else limit)
+            for product_id in candidates:
+                product = self._products[product_id]
+                if predicate is not None and not predicate(product):
+                    continue
+                results.append(dict(product))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def match_names(self, text, limit=3, min_coverage=0.5, predicate=None):
+        """
+        Produits dont le nom est cité dans `text` : on garde ceux qui partagent le plus de mots
+        avec la phrase. Si l'un d'eux est cité en entier, les autres doivent avoir au moins
+        `min_coverage` de leurs mots dans la phrase ("iphone 13" : iPhone 13, iPhone 13 Pro) ;
+        sinon la citation est ambiguë ("iphone") et tous les produits qui partagent ces mots sont
+        proposés (les noms les plus courts d'abord), sans en choisir un arbitrairement.
+        Les élisions et lettres isolées ("c'est") sont ignorées, et un nom cité en partie ne compte
+        que si un mot distinctif est cité ou si au moins `min_coverage` de ses mots le sont.
+        """
+        terms = {term for term in tokenize(text) if is_name_term(term)}
+        with self._lock:
+            matched = {}
+            for term in terms:
+                for product_id in self._name_postings.get(term, ()):
+                    matched.setdefault(product_id, []).append(term)
+            if not matched:
+                return []
+
+            # Seuls les noms les mieux cités ("iphone 13" écarte "iPhone 12")
+            best_count = max(len(shared) for shared in matched.values())
+            candidates = [
+                (best_count / len(self._name_terms[product_id]), product_id)
+                for product_id, shared in matched.items() if len(shared) == best_count
+            ]
+            if any(coverage == 1.0 for coverage, _ in candidates):
+                candidates = [c for c in candidates if c[0] >= min_coverage]
+            else:
+                candidates = [
+                    c for c in candidates
+                    if c[0] >= min_coverage or any(is_distinctive_term(term) for term in matched[c[1]])
+                ]
+            candidates.sort(key=lambda c: (-c[0], self._products[c[1]].get("nom") or ""))
+
+            results = []
+            for _, product_id in candidates:
+                product = self._products[product_id]
+                if predicate is not None and not predicate(product):
+                    continue
+                results.append(dict(product))
+                if len(results) >= limit:
+                    break
+            return results
@@ -0,0 +1,47 @@
+# query_fanout.py
+#
+# Exécution concurrente de requêtes Supabase indépendantes au sein d'une même requête HTTP :
+# la latence d'une page devient le maximum des requêtes au lieu de leur somme.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+# Pool partagé par le worker (les appels Supabase passent par un client httpx thread-safe)
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("QUERY_FANOUT_WORKERS", "8")),
+    thread_name_prefix="supabase-fanout",
+)
+
+
+def fan_out(*calls, executor=None):
+    """
+    Lance les fonctions sans argument `calls` en parallèle et retourne leurs résultats dans le même ordre.
+    Chaque appel s'exécute dans le contexte de l'application Flask courante (current_app.config disponible).
+    Si un appel lève une exception, elle est relancée une fois tous les appels terminés.
+    `executor` permet d'utiliser un autre pool, pour des appels qui lancent eux-mêmes un fan_out
+    (attendre le pool partagé depuis l'un de ses propres threads pourrait le bloquer).
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def in_context(call):
+        if app is None:
+            return call
+        def run():
+            with app.app_context():
+                return call()
+        return run
+
+    futures = [(executor or _EXECUTOR).submit(in_context(call)) for call in calls]
+
+    results = []
+    error = None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            error = error or e
+    if error is not None:
+        raise error
+    return results
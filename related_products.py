@@ -0,0 +1,112 @@
+# related_products.py
+#
+# Produits similaires affichés sur la fiche produit, calculés à l'avance :
+# similarité cosinus TF-IDF sur le nom et la description, bonus pour le même type
+# et pour un prix proche. Le calcul (coûteux) se fait en lot, en arrière-plan ;
+# l'affichage ne fait qu'une lecture dans un dictionnaire.
+import math
+import time
+
+import numpy as np
+
+from product_search import tokenize
+
+# Nombre de produits similaires conservés par produit
+RELATED_TOP_N = 4
+
+# Poids des critères dans le score final
+TEXT_WEIGHT = 0.6
+TYPE_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+# Un mot du nom compte plus qu'un mot de la description
+NAME_WEIGHT = 2.0
+# Deux prix sont « proches » jusqu'à ce facteur d'écart (au-delà, aucun bonus)
+PRICE_BAND_FACTOR = 3.0
+# Score minimal d'une recommandation : un prix proche ne suffit pas sans même type ni mots communs
+MIN_RELATED_SCORE = 0.2
+
+# Lignes de la matrice de similarité calculées à la fois (mémoire bornée même pour un grand catalogue)
+SIMILARITY_BLOCK_SIZE = 512
+
+
+def _fingerprint(products):
+    """Empreinte des champs utilisés : un catalogue inchangé n'est pas recalculé."""
+    return hash(tuple(sorted(
+        (str(p["id"]), p.get("nom") or "", p.get("description") or "", p.get("type") or "", float(p.get("prix_gnf") or 0))
+        for p in products
+    )))
+
+
+def compute_related(products, top_n=RELATED_TOP_N):
+    """Retourne {id_produit: [ids des produits similaires, du plus proche au moins proche]}."""
+    if len(products) < 2:
+        return {}
+    from scipy.sparse import hstack
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+
+    ids = [str(p["id"]) for p in products]
+
+    # Texte : TF-IDF du nom et de la description (mêmes termes que la recherche), vecteurs normalisés
+    def vectorize(field):
+        vectorizer = TfidfVectorizer(analyzer=tokenize)
+        try:
+            return vectorizer.fit_transform([p.get(field) or "" for p in products])
+        except ValueError:
+            # Aucun terme (ex. descriptions toutes vides)
+            return None
+    name_vectors = vectorize("nom")
+    if name_vectors is not None:
+        name_vectors = name_vectors * NAME_WEIGHT
+    matrices = [m for m in (name_vectors, vectorize("description")) if m is not None]
+    text_vectors = normalize(hstack(matrices).tocsr()) if matrices else None
+
+    types = np.array([p.get("type") or "" for p in products])
+    log_prices = np.log(np.array([max(float(p.get("prix_gnf") or 0), 1.0) for p in products]))
+    price_band = math.log(PRICE_BAND_FACTOR)
+
+    keep = min(top_n, len(products) - 1)
+    related = {}
+    for start in range(0, len(products), SIMILARITY_BLOCK_SIZE):
+        stop = min(start + SIMILARITY_BLOCK_SIZE, len(products))
+        if text_vectors is not None:
+            scores = TEXT_WEIGHT * (text_vectors[start:stop] @ text_vectors.T).toarray()
+        else:
+            scores = np.zeros((stop - start, len(products)))
+        scores += TYPE_WEIGHT * (types[start:stop, None] == types[None, :])
+        price_distance = np.abs(log_prices[start:stop, None] - log_prices[None, :])
+        scores += PRICE_WEIGHT * np.clip(1.0 - price_distance / price_band, 0.0, None)
+        # Un produit n'est pas son propre voisin
+        scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        best = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        for row, candidates in enumerate(best):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            related[ids[start + row]] = [ids[index] for index in ordered if scores[row, index] >= MIN_RELATED_SCORE]
+    return related
+
+
+class RelatedProducts:
+    """Recommandations précalculées ; la table est remplacée d'un bloc à chaque recalcul."""
+
+    def __init__(self, top_n=RELATED_TOP_N):
+        self.top_n = top_n
+        self._related = {}
+        self._fingerprint = None
+        self.built_at = None
+
+    def rebuild(self, products):
+        """Recalcule toute la table (appelé hors requête). Retourne False si le catalogue n'a pas changé."""
+        fingerprint = _fingerprint(products)
+        if fingerprint == self._fingerprint:
+            return False
+        related = compute_related(products, self.top_n)
+        # Simple remplacement de référence : les lectures en cours gardent l'ancienne table
+        self._related = related
+        self._fingerprint = fingerprint
+        self.built_at = time.monotonic()
+        return True
+
+    def get(self, product_id):
+        """Identifiants des produits similaires (liste vide si pas encore calculés)."""
+        return self._related.get(str(product_id), [])
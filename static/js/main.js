@@ -207,7 +207,7 @@ async function recordOrderOnAPI(clientName, clientQuartier, grandTotal) {
     };
 
     try {
-        // NOTE: L'URL '/api/enregistrer-commande' doit exister sur votre serveur
+        // Réponse immédiate (202) : la commande est écrite en arrière-plan, prix vérifiés par le serveur
         const response = await fetch('/api/enregistrer-commande', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -540,8 +540,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // --- GESTION DES ACTIONS SPÉCIFIQUES ---
 
-            // 2. Afficher les boutons de navigation rapide si l'intention est guide_vers_page
-            if (data.intent === 'guide_vers_page' && data.assistant_links && data.assistant_links.length > 0) {
+            // 2. Afficher les boutons de navigation rapide (guide_vers_page, ou fiches des produits cités)
+            if ((data.intent === 'guide_vers_page' || data.intent === 'produit') && data.assistant_links && data.assistant_links.length > 0) {
                 displayAssistantLinksButtons(data.assistant_links);
             }
 
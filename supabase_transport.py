@@ -0,0 +1,104 @@
+# supabase_transport.py
+#
+# Transport HTTP partagé par PostgREST, Storage et Auth : un seul pool de connexions
+# keep-alive par worker (HTTP/2 si le paquet 'h2' est installé), avec limites, délais
+# et compteurs d'utilisation du pool.
+import importlib.util
+import os
+import time
+from threading import Lock
+
+import httpx
+
+
+def load_transport_config():
+    """Paramètres du pool lus depuis l'environnement (valeurs par défaut raisonnables pour un worker)."""
+    h2_installed = importlib.util.find_spec("h2") is not None
+    http2 = os.environ.get("SUPABASE_HTTP2", "1" if h2_installed else "0") == "1"
+    if http2 and not h2_installed:
+        # httpx lèverait ImportError à la création du transport : l'application ne démarrerait pas
+        print("AVERTISSEMENT : SUPABASE_HTTP2=1 mais le paquet 'h2' n'est pas installé, HTTP/1.1 utilisé.")
+        http2 = False
+    return {
+        "max_connections": int(os.environ.get("SUPABASE_HTTP_MAX_CONNECTIONS", "20")),
+        "max_keepalive_connections": int(os.environ.get("SUPABASE_HTTP_MAX_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.environ.get("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "60")),
+        "connect_timeout": float(os.environ.get("SUPABASE_HTTP_CONNECT_TIMEOUT", "5")),
+        "timeout": float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "20")),
+        "pool_timeout": float(os.environ.get("SUPABASE_HTTP_POOL_TIMEOUT", "5")),
+        "http2": http2,
+    }
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """HTTPTransport qui compte les requêtes et expose l'état du pool de connexions."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = kwargs["limits"].max_connections
+        self._lock = Lock()
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_ms = 0.0
+
+    def handle_request(self, request):
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        start = time.perf_counter()
+        try:
+            return super().handle_request(request)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._total_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        """Compteurs de requêtes et utilisation du pool (connexions ouvertes / inactives)."""
+        connections = list(self._pool.connections)
+        open_connections = [c for c in connections if not c.is_closed()]
+        idle = sum(1 for c in open_connections if c.is_idle())
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "avg_ms": round(self._total_ms / self._requests, 2) if self._requests else 0.0,
+                "connections": len(open_connections),
+                "idle_connections": idle,
+                "max_connections": self.max_connections,
+                "pool_utilization": round((len(open_connections) - idle) / self.max_connections, 4) if self.max_connections else 0.0,
+            }
+
+
+def build_http_client(config=None):
+    """Client httpx à passer à Supabase (ClientOptions.httpx_client)."""
+    config = config or load_transport_config()
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive_connections"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        config["timeout"],
+        connect=config["connect_timeout"],
+        pool=config["pool_timeout"],
+    )
+    transport = MeteredTransport(limits=limits, http2=config["http2"])
+    return httpx.Client(transport=transport, timeout=timeout, follow_redirects=True)
+
+
+def transport_stats(http_client):
+    """Statistiques du transport d'un client créé par build_http_client()."""
+    transport = getattr(http_client, "_transport", None)
+    if isinstance(transport, MeteredTransport):
+        return transport.stats()
+    return {}